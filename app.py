@@ -1,15 +1,26 @@
 from flask import Flask, render_template, jsonify, request
 import plotly.graph_objs as go
 import plotly.utils
-from models import db, Hospital, Procedure, PricingData
+from models import db, Hospital, Procedure, Pricing
 from hospital_dataset_builder import load_hospital_dataset, HOSPITAL_NAMES
 from sqlalchemy import func, or_
 import re
 from collections import defaultdict, Counter
+from functools import lru_cache
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hospital_pricing.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    # Keep warm connections around instead of reopening per request, and
+    # cache compiled statements so hot queries skip SQL compilation
+    'pool_size': 10,
+    'max_overflow': 5,
+    'pool_timeout': 30,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+    'query_cache_size': 1200,
+}
 
 db.init_app(app)
 
@@ -31,10 +42,14 @@ for hospital_key in hospitals:
 
 print(f"📊 Total datasets loaded: {len(hospital_datasets)}")
 
+# Compiled once at import; these run for every search term / code
+NON_DIGIT_RE = re.compile(r'\D')
+CODE_LIKE_RE = re.compile(r'^[A-Z0-9\-]+$')
+
 def normalize_ndc(ndc_code):
     """Normalize NDC codes by removing separators and padding"""
     # Remove all non-digits
-    digits_only = re.sub(r'\D', '', str(ndc_code))
+    digits_only = NON_DIGIT_RE.sub('', str(ndc_code))
     
     # NDC codes should be 10-11 digits, pad to 11 if needed
     if len(digits_only) >= 9 and len(digits_only) <= 11:
@@ -42,6 +57,10 @@ def normalize_ndc(ndc_code):
         return digits_only.zfill(11)
     return None
 
+# Memoized: the pricing and chart endpoints re-run the exact search the
+# procedures endpoint already did. The datasets are immutable after
+# startup, so cached results never go stale; callers only read them.
+@lru_cache(maxsize=256)
 def find_cross_hospital_matches(search_term, max_results=50):
     """
     Find items across all hospitals that match the search term,
@@ -55,7 +74,7 @@ def find_cross_hospital_matches(search_term, max_results=50):
         results = dataset.search_by_keywords(search_term)
         
         # Also try direct code search if search term looks like a code
-        if re.match(r'^[A-Z0-9\-]+$', search_term.upper()):
+        if CODE_LIKE_RE.match(search_term.upper()):
             code_results = []
             # Try different code types
             for code_type in ['NDC', 'HCPCS', 'CPT', 'CDM']:
@@ -200,7 +219,7 @@ def get_procedures():
     
     if len(hospital_datasets) == 0:
         # Fallback to old database search if no datasets loaded
-        query = Procedure.query.join(PricingData)
+        query = Procedure.query.join(Pricing)
         search_filter = or_(
             Procedure.name.ilike(f'%{search}%'),
             Procedure.description.ilike(f'%{search}%'),
@@ -210,7 +229,7 @@ def get_procedures():
         procedures = query.limit(limit).all()
         return jsonify([{
             **procedure.to_dict(),
-            'hospital_count': PricingData.query.filter_by(procedure_id=procedure.id).count(),
+            'hospital_count': Pricing.query.filter_by(procedure_id=procedure.id).count(),
             'source': 'database'
         } for procedure in procedures])
     
@@ -270,7 +289,7 @@ def get_pricing_for_match(match_id):
         try:
             procedure_id = int(match_id)
             procedure = Procedure.query.get_or_404(procedure_id)
-            pricing_data = PricingData.query.filter_by(procedure_id=procedure_id).all()
+            pricing_data = Pricing.query.filter_by(procedure_id=procedure_id).all()
             
             result = {
                 'procedure': procedure.to_dict(),
@@ -505,7 +524,7 @@ def get_statistics():
         db_stats = {
             'hospitals': session.query(Hospital).count(),
             'procedures': session.query(Procedure).count(),
-            'pricing_records': session.query(PricingData).count(),
+            'pricing_records': session.query(Pricing).count(),
         }
     
     # Dataset stats
@@ -6,6 +6,19 @@ from datetime import datetime
 from app import app
 from models import db, Hospital, Procedure, PricingData
 
+def _to_float(value):
+    """Coerce a raw charge value to float, or None if not numeric.
+
+    Fast path for values that are already numbers so hot rows skip the
+    string round-trip entirely.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('$', '').replace(',', ''))
+    except (ValueError, TypeError):
+        return None
+
 def import_hospital_transparency_json(file_path):
     """
     Import hospital transparency JSON data.
@@ -55,12 +68,29 @@ def import_hospital_transparency_json(file_path):
         standard_charges = data.get('standard_charge_information', [])
         print(f'📊 Processing {len(standard_charges)} procedures...')
         
+        # Bulk import mode: stop autoflush from flushing pending rows on
+        # every dedup query, and keep committed objects usable without
+        # re-fetching them from the database after each batch commit.
+        # expire_on_commit must go on the real session - the scoped_session
+        # proxy forwards the autoflush setter but not this one
+        db.session.autoflush = False
+        db.session().expire_on_commit = False
+
         imported_count = 0
         skipped_count = 0
-        
+        data_source = file_path.split('/')[-1]
+        pending_pricing = []  # Batched rows for bulk insert
+        queued_keys = set()  # (hospital_id, procedure_id) pairs already queued
+
+        # Hoist loop-invariant lookups: the hospital id and import
+        # timestamp are the same for every row
+        hospital_id = hospital.id
+        import_time = datetime.utcnow()
+        total_charges = len(standard_charges)
+
         for i, item in enumerate(standard_charges):
             if i % 1000 == 0:
-                print(f'   Processed {i}/{len(standard_charges)} procedures...')
+                print(f'   Processed {i}/{total_charges} procedures...')
             
             # Extract procedure information
             procedure_name = item.get('description', 'Unknown Procedure')
@@ -115,21 +145,18 @@ def import_hospital_transparency_json(file_path):
             gross_charge = None
             
             for charge in standard_charges_list:
-                if isinstance(charge, dict):
-                    # Look for discounted cash price
-                    if charge.get('setting') == 'outpatient' or not cash_price:
-                        if 'discounted_cash' in charge:
-                            try:
-                                cash_price = float(charge['discounted_cash'])
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    # Look for gross charge
-                    if 'gross_charge' in charge:
-                        try:
-                            gross_charge = float(charge['gross_charge'])
-                        except (ValueError, TypeError):
-                            pass
+                if not isinstance(charge, dict):
+                    continue
+
+                # Pull both raw values once, then branch on the coerced
+                # results instead of re-testing membership per field
+                raw_cash = charge.get('discounted_cash')
+                if raw_cash is not None and (charge.get('setting') == 'outpatient' or not cash_price):
+                    cash_price = _to_float(raw_cash) or cash_price
+
+                raw_gross = charge.get('gross_charge')
+                if raw_gross is not None:
+                    gross_charge = _to_float(raw_gross) or gross_charge
             
             # Skip if no pricing data found
             if not cash_price and not gross_charge:
@@ -141,31 +168,39 @@ def import_hospital_transparency_json(file_path):
             min_rate = min(available_prices) if available_prices else None
             max_rate = max(available_prices) if available_prices else None
             
-            # Check if pricing data already exists
-            existing_pricing = PricingData.query.filter_by(
-                hospital_id=hospital.id,
+            # Check if pricing data already exists. The query can't see
+            # rows still queued for bulk insert (autoflush is off), so
+            # the set guards against duplicates within a batch
+            pricing_key = (hospital_id, procedure.id)
+            existing_pricing = pricing_key in queued_keys or PricingData.query.filter_by(
+                hospital_id=hospital_id,
                 procedure_id=procedure.id
             ).first()
-            
+
             if not existing_pricing:
-                # Create new pricing record
-                pricing_data = PricingData(
-                    hospital_id=hospital.id,
-                    procedure_id=procedure.id,
-                    cash_price=cash_price,
-                    gross_charge=gross_charge,
-                    min_rate=min_rate,
-                    max_rate=max_rate,
-                    data_source=file_path.split('/')[-1]
-                )
-                db.session.add(pricing_data)
+                # Queue row for bulk insert instead of a per-row add()
+                queued_keys.add(pricing_key)
+                pending_pricing.append({
+                    'hospital_id': hospital_id,
+                    'procedure_id': procedure.id,
+                    'cash_price': cash_price,
+                    'gross_charge': gross_charge,
+                    'min_rate': min_rate,
+                    'max_rate': max_rate,
+                    'data_source': data_source,
+                    'created_at': import_time
+                })
                 imported_count += 1
-            
-            # Commit every 100 records to avoid memory issues
-            if imported_count % 100 == 0:
+
+            # Flush a batch every 1000 records to bound memory
+            if len(pending_pricing) >= 1000:
+                db.session.bulk_insert_mappings(PricingData, pending_pricing)
                 db.session.commit()
-        
-        # Final commit
+                pending_pricing = []
+
+        # Final batch and commit
+        if pending_pricing:
+            db.session.bulk_insert_mappings(PricingData, pending_pricing)
         db.session.commit()
         
         print(f'✅ Import completed!')
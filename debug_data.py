@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Debug script to inspect what actually got imported into the database.
+Shows hospitals, record counts, sample pricing rows, and procedures
+that are shared across hospitals.
+"""
+
+from sqlalchemy.orm import joinedload
+
+from app import app
+from models import db, Hospital, Procedure, Pricing
+
+def analyze_data():
+    """Analyze the current database contents"""
+    with app.app_context():
+        hospitals = Hospital.query.all()
+        print(f'🏥 Hospitals in database: {len(hospitals)}')
+
+        # Records per hospital in a single GROUP BY instead of one
+        # count() round-trip per hospital
+        counts = dict(
+            db.session.query(Pricing.hospital_id, db.func.count())
+            .group_by(Pricing.hospital_id).all()
+        )
+        for hospital in hospitals:
+            print(f'   {hospital.name}: {counts.get(hospital.id, 0):,} pricing records')
+
+        # Sample pricing records (hospitals pre-fetched once instead of
+        # a Hospital.query.get() per record)
+        hmap = {h.id: h for h in hospitals}
+        print(f'\n📋 Sample pricing records:')
+        sample_rows = db.session.query(
+            Pricing.hospital_id, Pricing.procedure_id, Pricing.price
+        ).limit(10).all()
+        for hospital_id, procedure_id, price in sample_rows:
+            hospital = hmap[hospital_id]
+            print(f'   {hospital.name}: procedure {procedure_id} = ${price}')
+
+        # Example lookup: MRI procedures across hospitals
+        print(f'\n🔍 MRI procedures:')
+        mri_procedures = Procedure.query.filter(Procedure.description.ilike('%mri%')).limit(5).all()
+        for proc in mri_procedures:
+            print(f'   {proc.description[:60]}... (code: {proc.code})')
+            pricing_records = Pricing.query.options(
+                joinedload(Pricing.hospital)
+            ).filter_by(procedure_id=proc.id).all()
+            for pricing in pricing_records:
+                print(f'      {pricing.hospital.name}: ${pricing.price}')
+
+        # Procedures shared by multiple hospitals
+        print(f'\n🔗 Procedures shared across hospitals:')
+        # CTE narrows to shared procedure ids first, so the name
+        # aggregation below only touches the handful of matching rows
+        shared_ids = db.session.query(
+            Pricing.procedure_id.label('procedure_id'),
+            db.func.count(db.func.distinct(Pricing.hospital_id)).label('hospital_count')
+        ).group_by(Pricing.procedure_id).having(
+            db.func.count(db.func.distinct(Pricing.hospital_id)) >= 2
+        ).limit(10).cte('shared_procedures')
+
+        shared = db.session.query(
+            Procedure.description,
+            shared_ids.c.hospital_count,
+            db.func.group_concat(db.func.distinct(Hospital.name)).label('hospital_names')
+        ).join(
+            shared_ids, shared_ids.c.procedure_id == Procedure.id
+        ).join(
+            Pricing, Pricing.procedure_id == Procedure.id
+        ).join(
+            Hospital, Hospital.id == Pricing.hospital_id
+        ).group_by(Procedure.id).all()
+
+        print(f'   Found {len(shared)} shared procedures (showing up to 10)')
+        for description, hospital_count, hospital_names in shared:
+            print(f'   {description[:50]}... ({hospital_count} hospitals)')
+            print(f'      Hospitals: {hospital_names}')
+
+if __name__ == '__main__':
+    analyze_data()
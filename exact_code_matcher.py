@@ -6,10 +6,46 @@ No synthetic or hallucinated data - only real matched codes.
 """
 
 import json
+import re
 import sqlite3
 import os
+import sys
 from typing import Dict, List, Any, Set, Tuple
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import ijson  # Streaming parser - avoids loading 1GB+ files into memory
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # Much faster whole-file decoding than stdlib json
+except ImportError:
+    orjson = None
+
+# Priority order of code fields for hospitals that put codes at the top
+# level instead of in code_information
+CODE_FIELDS = [
+    ('code', 'CPT'),
+    ('cpt_code', 'CPT'),
+    ('hcpcs_code', 'HCPCS'),
+    ('ndc_code', 'NDC'),
+    ('drg_code', 'DRG'),
+    ('revenue_code', 'REV')
+]
+
+# Strips currency formatting ('$', thousands separators) in one pass
+CURRENCY_RE = re.compile(r'[$,]')
+
+# Rows per multi-row insert batch during the bulk load
+INSERT_BATCH_SIZE = 10000
+
+# Priority order of price fields for the same fallback format
+PRICE_FIELDS = [
+    'gross_charge', 'price', 'amount', 'charge', 'standard_charge',
+    'cash_price', 'de_identified_min_negotiated_charge'
+]
 
 class ExactCodeMatcher:
     def __init__(self, db_path: str = 'instance/hospital_pricing.db'):
@@ -24,26 +60,22 @@ class ExactCodeMatcher:
     
     def init_database(self):
         """Initialize database with clean schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Drop existing tables
-        cursor.execute('DROP TABLE IF EXISTS pricing')
-        cursor.execute('DROP TABLE IF EXISTS procedures')
-        cursor.execute('DROP TABLE IF EXISTS hospitals')
-        
-        # Create hospitals table
-        cursor.execute('''
+        # Autocommit connection + one executescript round for all DDL;
+        # indices are created after the bulk load (see create_indexes) so
+        # inserts don't pay per-row index maintenance
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.executescript('''
+            DROP TABLE IF EXISTS pricing;
+            DROP TABLE IF EXISTS procedures;
+            DROP TABLE IF EXISTS hospitals;
+
             CREATE TABLE hospitals (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
                 file_name TEXT,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create procedures table
-        cursor.execute('''
+            );
+
             CREATE TABLE procedures (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 description TEXT NOT NULL,
@@ -51,11 +83,8 @@ class ExactCodeMatcher:
                 code_type TEXT NOT NULL,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(code, code_type)
-            )
-        ''')
-        
-        # Create pricing table
-        cursor.execute('''
+            );
+
             CREATE TABLE pricing (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 hospital_id INTEGER NOT NULL,
@@ -65,16 +94,15 @@ class ExactCodeMatcher:
                 FOREIGN KEY (hospital_id) REFERENCES hospitals(id),
                 FOREIGN KEY (procedure_id) REFERENCES procedures(id),
                 UNIQUE(hospital_id, procedure_id)
-            )
+            );
         ''')
-        
-        # Create indices
-        cursor.execute('CREATE INDEX idx_procedures_code ON procedures(code, code_type)')
-        cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
-        
-        conn.commit()
         conn.close()
         print("Clean database initialized")
+
+    def create_indexes(self, cursor):
+        """Create lookup indices once the bulk load is done"""
+        cursor.execute('CREATE INDEX idx_procedures_code ON procedures(code, code_type)')
+        cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
     
     def extract_code_and_type_from_ucsf(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Extract codes from UCSF format"""
@@ -83,40 +111,40 @@ class ExactCodeMatcher:
             for code_info in item['code_information']:
                 if 'code' in code_info and 'type' in code_info:
                     code_value = str(code_info['code']).strip()
-                    code_type = str(code_info['type']).strip().upper()
+                    code_type = sys.intern(str(code_info['type']).strip().upper())
                     if code_value and code_type:
                         codes.append((code_value, code_type))
         return codes
-    
+
     def extract_code_and_type_from_others(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Extract codes from other hospitals' format"""
         codes = []
-        
-        # Priority order for code types
-        code_fields = [
-            ('code', 'CPT'),
-            ('cpt_code', 'CPT'),
-            ('hcpcs_code', 'HCPCS'),
-            ('ndc_code', 'NDC'),
-            ('drg_code', 'DRG'),
-            ('revenue_code', 'REV')
-        ]
-        
-        for field_name, code_type in code_fields:
+
+        for field_name, code_type in CODE_FIELDS:
             if field_name in item and item[field_name]:
                 code_value = str(item[field_name]).strip()
                 if code_value and code_value != 'null' and len(code_value) > 0:
                     codes.append((code_value, code_type))
-        
+                    # CODE_FIELDS is ordered by priority and most hospitals
+                    # expose a single code field, so stop at the first hit
+                    break
+
         return codes
     
     def extract_price_from_ucsf(self, item: Dict[str, Any]) -> float:
         """Extract price from UCSF format"""
         if 'standard_charges' in item:
             for charge in item['standard_charges']:
-                if 'gross_charge' in charge and charge['gross_charge']:
+                raw = charge.get('gross_charge')
+                if raw:
+                    # Fast path: most charges arrive as plain numbers, so
+                    # skip the string round-trip for those
+                    if isinstance(raw, (int, float)):
+                        if raw > 0:
+                            return float(raw)
+                        continue
                     try:
-                        value = float(str(charge['gross_charge']).replace('$', '').replace(',', ''))
+                        value = float(CURRENCY_RE.sub('', str(raw)))
                         if value > 0:
                             return value
                     except (ValueError, TypeError):
@@ -125,15 +153,10 @@ class ExactCodeMatcher:
     
     def extract_price_from_others(self, item: Dict[str, Any]) -> float:
         """Extract price from other hospitals' format"""
-        price_fields = [
-            'gross_charge', 'price', 'amount', 'charge', 'standard_charge',
-            'cash_price', 'de_identified_min_negotiated_charge'
-        ]
-        
-        for field in price_fields:
+        for field in PRICE_FIELDS:
             if field in item and item[field] is not None:
                 try:
-                    value_str = str(item[field]).replace('$', '').replace(',', '')
+                    value_str = CURRENCY_RE.sub('', str(item[field]))
                     value = float(value_str)
                     if value > 0:
                         return value
@@ -150,25 +173,41 @@ class ExactCodeMatcher:
             print(f"File not found: {file_path}")
             return
         
+        source = None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
             # All hospitals use the same format with standard_charge_information
-            items = []
-            if 'standard_charge_information' in data:
-                items = data['standard_charge_information']
-            
-            print(f"Found {len(items)} items in {hospital_name}")
-            
+            if ijson is not None:
+                # Stream items one at a time instead of json.load-ing the
+                # whole multi-GB file into memory
+                source = open(file_path, 'rb')
+                items = ijson.items(source, 'standard_charge_information.item',
+                                    use_float=True)
+            elif orjson is not None:
+                with open(file_path, 'rb') as f:
+                    data = orjson.loads(f.read())
+                items = data.get('standard_charge_information', [])
+                print(f"Found {len(items)} items in {hospital_name}")
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                items = data.get('standard_charge_information', [])
+                print(f"Found {len(items)} items in {hospital_name}")
+
             # Parse items and group by code
             hospital_items = {}
+            desc_lens = {}  # code_key -> length of the stored description
             processed_count = 0
-            
+
             for i, item in enumerate(items):
                 if i % 10000 == 0:
-                    print(f"  Processing {i}/{len(items)} items...")
-                
+                    print(f"  Processing item {i}...")
+
+                # Cheap structural sentinel: items without both a code
+                # section and charges can never match, so skip them before
+                # doing any string work
+                if 'code_information' not in item or 'standard_charges' not in item:
+                    continue
+
                 # Extract description
                 description = item.get('description', '').strip()
                 if not description or len(description) < 3:
@@ -180,13 +219,22 @@ class ExactCodeMatcher:
                 
                 if not codes or price is None:
                     continue
-                
+
+                # Intern so repeated descriptions/code types across items
+                # (and hospitals) share one string object instead of copies
+                description = sys.intern(description)
+                desc_len = len(description)
+
                 # Process each code
                 for code_value, code_type in codes:
-                    code_key = f"{code_value}|{code_type}"
-                    
-                    # Store the item (keep the one with best description if duplicate)
-                    if code_key not in hospital_items or len(description) > len(hospital_items[code_key]['description']):
+                    # Tuple key - no per-code string formatting/allocation
+                    code_key = (code_value, code_type)
+
+                    # Keep the item with the longest description per code;
+                    # cached lengths make this one compare, no re-measuring
+                    # or double dict lookup
+                    if desc_len > desc_lens.get(code_key, 0):
+                        desc_lens[code_key] = desc_len
                         hospital_items[code_key] = {
                             'code': code_value,
                             'code_type': code_type,
@@ -203,30 +251,33 @@ class ExactCodeMatcher:
             print(f"Error loading {hospital_name}: {e}")
             import traceback
             traceback.print_exc()
-    
+        finally:
+            if source is not None:
+                source.close()
+
     def find_code_matches(self):
         """Find codes that appear in multiple hospitals"""
         print("\nFinding code matches across hospitals...")
         
-        # Group all items by code+type
+        # Group all items by code+type in one pass, then filter to codes
+        # appearing in at least 2 hospitals
         all_codes = defaultdict(list)
-        
+
+        bucket = all_codes.__getitem__  # Bound once for the hot loop
         for hospital_name, items in self.hospital_data.items():
             for code_key, item in items.items():
-                all_codes[code_key].append((hospital_name, item))
-        
-        # Keep only codes that appear in multiple hospitals
-        multi_hospital_codes = {}
-        for code_key, hospital_items in all_codes.items():
-            if len(hospital_items) >= 2:  # At least 2 hospitals
-                multi_hospital_codes[code_key] = hospital_items
-        
-        self.code_matches = multi_hospital_codes
-        print(f"Found {len(multi_hospital_codes)} codes that appear in multiple hospitals")
+                bucket(code_key).append((hospital_name, item))
+
+        self.code_matches = {
+            code_key: hospital_items
+            for code_key, hospital_items in all_codes.items()
+            if len(hospital_items) >= 2
+        }
+        print(f"Found {len(self.code_matches)} codes that appear in multiple hospitals")
         
         # Show distribution
         distribution = defaultdict(int)
-        for hospital_items in multi_hospital_codes.values():
+        for hospital_items in self.code_matches.values():
             distribution[len(hospital_items)] += 1
         
         print("Distribution of codes by hospital count:")
@@ -238,10 +289,17 @@ class ExactCodeMatcher:
         print("\nCreating database with matched codes...")
         
         self.init_database()
-        
+
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+
+        # Bulk-load settings: skip fsync per statement and keep the
+        # rollback journal in memory, then run everything in one
+        # explicit transaction so each insert is not its own commit
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.execute('PRAGMA journal_mode = MEMORY')
+        cursor.execute('BEGIN')
+
         # Insert hospitals
         hospital_ids = {}
         for hospital_name in self.hospital_data.keys():
@@ -253,45 +311,58 @@ class ExactCodeMatcher:
         
         # Insert procedures and pricing
         procedure_count = 0
-        pricing_count = 0
-        
+        pricing_rows = []  # Batched (hospital_id, procedure_id, price) rows
+
+        procedure_ids = {}  # (code, code_type) -> procedure id
+
         for code_key, hospital_items in self.code_matches.items():
             # Use the description from the first item (they should be similar)
             primary_item = hospital_items[0][1]
-            
-            # Insert procedure
-            cursor.execute('''
-                INSERT OR IGNORE INTO procedures (description, code, code_type) 
-                VALUES (?, ?, ?)
-            ''', (
-                primary_item['description'],
-                primary_item['code'],
-                primary_item['code_type']
-            ))
-            
-            cursor.execute(
-                'SELECT id FROM procedures WHERE code = ? AND code_type = ?',
-                (primary_item['code'], primary_item['code_type'])
-            )
-            procedure_id = cursor.fetchone()[0]
-            
-            if cursor.rowcount > 0:  # New procedure was inserted
-                procedure_count += 1
-            
-            # Insert pricing for each hospital
-            for hospital_name, item in hospital_items:
+
+            # Insert procedure, caching its id so repeat codes don't
+            # issue a SELECT round-trip per row
+            id_key = (primary_item['code'], primary_item['code_type'])
+            procedure_id = procedure_ids.get(id_key)
+            if procedure_id is None:
                 cursor.execute('''
-                    INSERT OR IGNORE INTO pricing (hospital_id, procedure_id, price) 
+                    INSERT OR IGNORE INTO procedures (description, code, code_type)
                     VALUES (?, ?, ?)
                 ''', (
+                    primary_item['description'],
+                    primary_item['code'],
+                    primary_item['code_type']
+                ))
+                if cursor.rowcount > 0:  # New procedure was inserted
+                    procedure_id = cursor.lastrowid
+                    procedure_count += 1
+                else:
+                    cursor.execute(
+                        'SELECT id FROM procedures WHERE code = ? AND code_type = ?',
+                        id_key
+                    )
+                    procedure_id = cursor.fetchone()[0]
+                procedure_ids[id_key] = procedure_id
+            
+            # Queue pricing rows for a single executemany below
+            for hospital_name, item in hospital_items:
+                pricing_rows.append((
                     hospital_ids[hospital_name],
                     procedure_id,
                     item['price']
                 ))
-                
-                if cursor.rowcount > 0:  # New pricing was inserted
-                    pricing_count += 1
-        
+
+        # Batched multi-row inserts, chunked to bound the statement size
+        pricing_count = 0
+        for start in range(0, len(pricing_rows), INSERT_BATCH_SIZE):
+            cursor.executemany('''
+                INSERT OR IGNORE INTO pricing (hospital_id, procedure_id, price)
+                VALUES (?, ?, ?)
+            ''', pricing_rows[start:start + INSERT_BATCH_SIZE])
+            pricing_count += cursor.rowcount
+
+        # Build indices in one pass now that the tables are populated
+        self.create_indexes(cursor)
+
         conn.commit()
         conn.close()
         
@@ -301,7 +372,9 @@ class ExactCodeMatcher:
         """Print final statistics"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+        # Fetch result rows in larger batches per C-level round trip
+        cursor.arraysize = 1000
+
         cursor.execute('SELECT COUNT(*) FROM hospitals')
         hospitals_count = cursor.fetchone()[0]
         
@@ -353,9 +426,10 @@ class ExactCodeMatcher:
             ORDER BY hospital_count DESC, p.description
             LIMIT 10
         ''')
-        samples = cursor.fetchall()
-        
-        for desc, code, code_type, hosp_count in samples:
+
+        # Iterate the cursor directly - rows arrive in arraysize batches
+        # without materializing an intermediate list first
+        for desc, code, code_type, hosp_count in cursor:
             print(f"  {desc[:50]}... (Code: {code}, Type: {code_type}, Hospitals: {hosp_count})")
         
         conn.close()
@@ -369,10 +443,12 @@ class ExactCodeMatcher:
             ('951644600_CEDARS-SINAI-MEDICAL-CENTER_STANDARDCHARGES.json', 'Cedars-Sinai Medical Center')
         ]
         
-        # Load all hospital data
-        for file_path, hospital_name in hospital_files:
-            self.load_hospital_data(file_path, hospital_name)
-        
+        # Parse the four files in parallel - each is CPU-bound JSON
+        # decoding, so one worker process per file
+        with ProcessPoolExecutor(max_workers=len(hospital_files)) as executor:
+            for hospital_name, items in executor.map(_parse_hospital_file, hospital_files):
+                self.hospital_data[hospital_name] = items
+
         # Find exact matches
         self.find_code_matches()
         
@@ -382,6 +458,13 @@ class ExactCodeMatcher:
         # Print statistics
         self.print_statistics()
 
+def _parse_hospital_file(args):
+    """Worker: parse one hospital file in a separate process"""
+    file_path, hospital_name = args
+    matcher = ExactCodeMatcher()
+    matcher.load_hospital_data(file_path, hospital_name)
+    return hospital_name, matcher.hospital_data.get(hospital_name, {})
+
 if __name__ == "__main__":
     matcher = ExactCodeMatcher()
     matcher.run_exact_matching() 
\ No newline at end of file
@@ -5,12 +5,53 @@ Uses efficient code-based grouping + selective description matching.
 Much faster than the previous approach.
 """
 
-import json
 import sqlite3
 import os
 import re
+import string
+import sys
+from numbers import Number
 from typing import Dict, List, Any, Set, Tuple
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from hospital_json import load_standard_charges
+
+# Built once at import - normalize_description runs on every item.
+# str.translate is a plain character remap, cheaper than the regex engine.
+PUNCT_TABLE = str.maketrans({c: ' ' for c in string.punctuation})
+
+# All category keywords folded into one alternation so categorization
+# is a single regex scan instead of six substring passes per item.
+# Group names double as the category labels.
+CATEGORY_RE = re.compile(
+    r'(?P<Diabetes>insulin|glucose|diabetic)'
+    r'|(?P<Imaging>mri|ct scan|x-ray|ultrasound|imaging)'
+    r'|(?P<Surgery>surgery|surgical|operation)'
+    r'|(?P<Laboratory>lab|test|blood|analysis)'
+    r'|(?P<Vaccines>vaccine|immunization)'
+    r'|(?P<Medications>antibiotic|medication|drug)'
+)
+
+# Words too generic to signal a match between descriptions
+COMMON_WORDS = frozenset({'mg', 'ml', 'unit', 'dose', 'tablet', 'injection', 'solution', 'each', 'per', 'of', 'for', 'with', 'and', 'or', 'the', 'a', 'an'})
+
+def _word_signature(words):
+    """64-bit Bloom-style sketch of a word set - one bit per word hash.
+
+    Two descriptions can only share words where their sketches share
+    bits, so a popcount of the AND cheaply rejects most non-matches
+    before the exact set intersection runs.
+    """
+    sig = 0
+    for word in words:
+        sig |= 1 << (hash(word) & 63)
+    return sig
+
+def _has_multiple_hospitals(items):
+    """True once two distinct hospitals are seen - no set is built"""
+    first = items[0]['hospital']
+    return any(item['hospital'] != first for item in items)
 
 class FastMatcher:
     def __init__(self, db_path: str = 'instance/hospital_pricing.db'):
@@ -22,11 +63,19 @@ class FastMatcher:
         """Ensure instance directory exists"""
         os.makedirs('instance', exist_ok=True)
     
+    def apply_bulk_pragmas(self, cursor):
+        """Tune SQLite for bulk loading - WAL avoids an fsync per statement"""
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-200000')
+
     def init_database(self):
         """Initialize database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+        self.apply_bulk_pragmas(cursor)
+
         # Drop existing tables
         cursor.execute('DROP TABLE IF EXISTS pricing')
         cursor.execute('DROP TABLE IF EXISTS procedures')
@@ -67,11 +116,6 @@ class FastMatcher:
             )
         ''')
         
-        # Create indices
-        cursor.execute('CREATE INDEX idx_procedures_desc ON procedures(description)')
-        cursor.execute('CREATE INDEX idx_procedures_code ON procedures(code)')
-        cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
-        
         conn.commit()
         conn.close()
         print("Fast database initialized")
@@ -83,68 +127,62 @@ class FastMatcher:
             for code_info in item['code_information']:
                 if 'code' in code_info and 'type' in code_info:
                     code_value = str(code_info['code']).strip()
-                    code_type = str(code_info['type']).strip().upper()
+                    # A handful of code types repeat across millions of
+                    # items - intern them so each is stored once
+                    code_type = sys.intern(str(code_info['type']).strip().upper())
                     if code_value and code_type:
                         codes.append((code_value, code_type))
         return codes
     
     def extract_price(self, item: Dict[str, Any]) -> float:
         """Extract price from item"""
-        if 'standard_charges' in item:
-            for charge in item['standard_charges']:
-                if 'gross_charge' in charge and charge['gross_charge']:
-                    try:
-                        value = float(str(charge['gross_charge']).replace('$', '').replace(',', ''))
-                        if value > 0:
-                            return value
-                    except (ValueError, TypeError):
-                        continue
+        for charge in item.get('standard_charges', ()):
+            raw = charge.get('gross_charge')
+            if not raw:
+                continue
+            # Most charges are already numeric in the JSON - take them
+            # without the str/replace/float round-trip. Number also
+            # covers Decimal, which streaming parsers can yield
+            if isinstance(raw, Number):
+                if raw > 0:
+                    return float(raw)
+                continue
+            if isinstance(raw, str):
+                # lstrip only touches a leading '$' - cheaper than a
+                # full replace pass over the string
+                try:
+                    value = float(raw.lstrip('$').replace(',', ''))
+                    if value > 0:
+                        return value
+                except ValueError:
+                    continue
+            # any other type cannot carry a price
         return None
     
-    def categorize_procedure(self, description: str) -> str:
-        """Categorize procedures"""
-        desc_lower = description.lower()
-        
-        if any(word in desc_lower for word in ['insulin', 'glucose', 'diabetic']):
-            return 'Diabetes'
-        elif any(word in desc_lower for word in ['mri', 'ct scan', 'x-ray', 'ultrasound', 'imaging']):
-            return 'Imaging'
-        elif any(word in desc_lower for word in ['surgery', 'surgical', 'operation']):
-            return 'Surgery'
-        elif any(word in desc_lower for word in ['lab', 'test', 'blood', 'analysis']):
-            return 'Laboratory'
-        elif any(word in desc_lower for word in ['vaccine', 'immunization']):
-            return 'Vaccines'
-        elif any(word in desc_lower for word in ['antibiotic', 'medication', 'drug']):
-            return 'Medications'
-        else:
-            return 'Other'
+    def categorize_procedure(self, desc_lower: str) -> str:
+        """Categorize procedures - expects an already lowercased description"""
+        match = CATEGORY_RE.search(desc_lower)
+        return match.lastgroup if match else 'Other'
     
-    def normalize_description(self, desc: str) -> str:
-        """Normalize description for matching"""
-        # Remove special characters, normalize spacing
-        desc = re.sub(r'[^\w\s]', ' ', desc.lower())
-        desc = re.sub(r'\s+', ' ', desc).strip()
-        return desc
+    def normalize_description(self, desc_lower: str) -> str:
+        """Normalize an already lowercased description for matching"""
+        # Remove special characters, normalize spacing.
+        # split() with no argument collapses whitespace runs for free.
+        return ' '.join(desc_lower.translate(PUNCT_TABLE).split())
     
-    def description_similarity(self, desc1: str, desc2: str) -> bool:
-        """Fast description similarity check"""
-        # Split into words and check for significant overlap
-        words1 = set(desc1.split())
-        words2 = set(desc2.split())
-        
-        # Filter out common words
-        common_words = {'mg', 'ml', 'unit', 'dose', 'tablet', 'injection', 'solution', 'each', 'per', 'of', 'for', 'with', 'and', 'or', 'the', 'a', 'an'}
-        words1 = words1 - common_words
-        words2 = words2 - common_words
-        
+    def description_similarity(self, words1: frozenset, words2: frozenset) -> bool:
+        """Fast description similarity check on precomputed word sets"""
+        # Word sets are built once at load time (common words already
+        # removed), so each call is a single C-level set intersection
         if not words1 or not words2:
             return False
-        
+
+        min_words = min(len(words1), len(words2))
+        if min_words < 2:
+            return False  # overlap can never reach the 2-word floor
+
         # Check for significant word overlap
         overlap = len(words1 & words2)
-        min_words = min(len(words1), len(words2))
-        
         return overlap >= max(2, min_words * 0.6)  # At least 60% overlap
     
     def load_hospital_data(self, file_path: str, hospital_name: str):
@@ -156,10 +194,7 @@ class FastMatcher:
             return
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            items = data.get('standard_charge_information', [])
+            items = load_standard_charges(file_path)
             print(f"Found {len(items)} items")
             
             processed_items = []
@@ -177,13 +212,20 @@ class FastMatcher:
                 if price is None or price <= 0:
                     continue
                 
+                # Lowercase once per item - normalization and
+                # categorization both consume the same form
+                desc_lower = description.lower()
+                normalized = self.normalize_description(desc_lower)
+                word_set = frozenset(normalized.split()) - COMMON_WORDS
                 processed_items.append({
                     'hospital': hospital_name,
                     'description': description,
-                    'normalized_desc': self.normalize_description(description),
+                    'normalized_desc': normalized,
+                    'word_set': word_set,
+                    'word_sig': _word_signature(word_set),
                     'price': price,
                     'codes': codes,
-                    'category': self.categorize_procedure(description)
+                    'category': self.categorize_procedure(desc_lower)
                 })
             
             self.hospital_data[hospital_name] = processed_items
@@ -203,9 +245,10 @@ class FastMatcher:
         for hospital_name, items in self.hospital_data.items():
             for item in items:
                 if item['codes']:
-                    # Use the first code as primary
-                    primary_code = f"{item['codes'][0][0]}|{item['codes'][0][1]}"
-                    code_groups[primary_code].append(item)
+                    # Use the first code as primary. The (code, type)
+                    # tuple keys the group directly - no string
+                    # formatting per item
+                    code_groups[item['codes'][0]].append(item)
                 else:
                     no_code_items.append(item)
         
@@ -214,8 +257,7 @@ class FastMatcher:
         # Process exact code matches
         exact_matches = 0
         for code, items in code_groups.items():
-            hospitals = set(item['hospital'] for item in items)
-            if len(hospitals) >= 2:
+            if _has_multiple_hospitals(items):
                 matches.append(items)
                 exact_matches += 1
         
@@ -234,23 +276,49 @@ class FastMatcher:
                 
             print(f"  Processing {category}: {len(items)} items")
             
-            # Group by similar descriptions
+            # Group by similar descriptions. An inverted index from word
+            # to group ids limits each item to groups that share at least
+            # one word, instead of scanning every group (O(N^2)).
             grouped = []
+            postings = defaultdict(list)  # word -> ids of groups whose representative has it
+
+            # Bind hot lookups once outside the per-item loop
+            similarity = self.description_similarity
+            add_group = grouped.append
+
             for item in items:
+                word_set = item['word_set']
+                word_sig = item['word_sig']
+
+                candidate_ids = set()
+                for word in word_set:
+                    candidate_ids.update(postings[word])
+
                 placed = False
-                for group in grouped:
-                    if self.description_similarity(item['normalized_desc'], group[0]['normalized_desc']):
+                for group_id in sorted(candidate_ids):
+                    group = grouped[group_id]
+                    representative = group[0]
+                    # Sketch pre-check: fewer than 2 shared bits means
+                    # the 2-word overlap floor is (almost surely) out of
+                    # reach - skip the exact intersection
+                    if (word_sig & representative['word_sig']).bit_count() < 2:
+                        continue
+                    if similarity(word_set, representative['word_set']):
                         group.append(item)
                         placed = True
                         break
-                
+
                 if not placed:
-                    grouped.append([item])
+                    group_id = len(grouped)
+                    add_group([item])
+                    # Only the first item of a group is ever compared
+                    # against, so only its words go into the index
+                    for word in word_set:
+                        postings[word].append(group_id)
             
             # Keep groups with multiple hospitals
             for group in grouped:
-                hospitals = set(item['hospital'] for item in group)
-                if len(hospitals) >= 2:
+                if _has_multiple_hospitals(group):
                     matches.append(group)
                     desc_matches += 1
         
@@ -268,55 +336,75 @@ class FastMatcher:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+        self.apply_bulk_pragmas(cursor)
+
+        # One explicit transaction for the whole load
+        cursor.execute('BEGIN')
+
         # Insert hospitals
         hospital_ids = {}
         for hospital_name in self.hospital_data.keys():
             cursor.execute('INSERT INTO hospitals (name) VALUES (?)', (hospital_name,))
             hospital_ids[hospital_name] = cursor.lastrowid
-        
-        # Insert procedures and pricing
-        procedure_count = 0
-        pricing_count = 0
-        
-        for match_group in matches:
-            # Use the best description
-            best_item = max(match_group, key=lambda x: len(x['description']))
-            
-            # Get primary code
+
+        # Accumulate rows and insert in bulk - one executemany beats tens
+        # of thousands of single-row execute calls. Procedure ids are
+        # assigned up front so pricing rows can reference them without
+        # waiting on lastrowid per insert.
+        procedure_rows = []
+        pricing_rows = []
+
+        for procedure_id, match_group in enumerate(matches, start=1):
+            # One pass over the group picks the longest description and
+            # the first primary code together - no max(key=lambda) frame
+            # per element and no second scan
+            best_item = match_group[0]
+            best_len = len(best_item['description'])
             primary_code = None
             primary_code_type = None
             for item in match_group:
-                if item['codes']:
+                desc_len = len(item['description'])
+                if desc_len > best_len:
+                    best_item = item
+                    best_len = desc_len
+                if primary_code is None and item['codes']:
                     primary_code = item['codes'][0][0]
                     primary_code_type = item['codes'][0][1]
-                    break
-            
-            # Insert procedure
-            cursor.execute('''
-                INSERT INTO procedures (description, code, code_type, category) 
-                VALUES (?, ?, ?, ?)
-            ''', (
+
+            procedure_rows.append((
+                procedure_id,
                 best_item['description'],
                 primary_code,
                 primary_code_type,
                 best_item['category']
             ))
-            procedure_id = cursor.lastrowid
-            procedure_count += 1
-            
-            # Insert pricing for each hospital
+
+            # Pricing for each hospital
             for item in match_group:
-                cursor.execute('''
-                    INSERT INTO pricing (hospital_id, procedure_id, price) 
-                    VALUES (?, ?, ?)
-                ''', (
+                pricing_rows.append((
                     hospital_ids[item['hospital']],
                     procedure_id,
                     item['price']
                 ))
-                pricing_count += 1
-        
+
+        cursor.executemany('''
+            INSERT INTO procedures (id, description, code, code_type, category)
+            VALUES (?, ?, ?, ?, ?)
+        ''', procedure_rows)
+        cursor.executemany('''
+            INSERT INTO pricing (hospital_id, procedure_id, price)
+            VALUES (?, ?, ?)
+        ''', pricing_rows)
+
+        procedure_count = len(procedure_rows)
+        pricing_count = len(pricing_rows)
+
+        # Indices are built after the bulk insert - populating them row
+        # by row during the load is slower than one build at the end
+        cursor.execute('CREATE INDEX idx_procedures_desc ON procedures(description)')
+        cursor.execute('CREATE INDEX idx_procedures_code ON procedures(code)')
+        cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
+
         conn.commit()
         conn.close()
         
@@ -412,9 +500,11 @@ class FastMatcher:
             ('951644600_CEDARS-SINAI-MEDICAL-CENTER_STANDARDCHARGES.json', 'Cedars-Sinai Medical Center')
         ]
         
-        # Load data
-        for file_path, hospital_name in hospital_files:
-            self.load_hospital_data(file_path, hospital_name)
+        # Load data - one worker per file, the files are independent so
+        # each process parses its own JSON without fighting over the GIL
+        with ProcessPoolExecutor(max_workers=len(hospital_files)) as executor:
+            for hospital_name, items in executor.map(_load_hospital_file, hospital_files):
+                self.hospital_data[hospital_name] = items
         
         # Create database
         self.create_database()
@@ -422,6 +512,13 @@ class FastMatcher:
         # Print statistics
         self.print_statistics()
 
+def _load_hospital_file(args):
+    """Worker for parallel loading - must be module-level to be picklable"""
+    file_path, hospital_name = args
+    matcher = FastMatcher()
+    matcher.load_hospital_data(file_path, hospital_name)
+    return hospital_name, matcher.hospital_data.get(hospital_name, [])
+
 if __name__ == "__main__":
     matcher = FastMatcher()
     matcher.run() 
\ No newline at end of file
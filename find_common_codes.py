@@ -4,21 +4,26 @@ Simple script to find codes that appear in all 4 hospitals.
 This will help us identify real matches for comparison.
 """
 
-import json
 import os
 import re
 from collections import defaultdict
 
+from hospital_json import load_standard_charges
+
+# Compiled once at import - normalize_code runs on every code of every item
+CODE_SEPARATOR_RE = re.compile(r'[-\s\.]')
+NON_DIGIT_RE = re.compile(r'\D')
+
 def normalize_code(code_value, code_type):
     """Normalize codes to catch format variations"""
     code = str(code_value).strip().upper()
-    
+
     # Remove common separators and formatting
-    code = re.sub(r'[-\s\.]', '', code)
-    
+    code = CODE_SEPARATOR_RE.sub('', code)
+
     # For NDC codes, normalize to 11 digits
     if code_type.upper() in ['NDC']:
-        code = re.sub(r'\D', '', code)  # Keep only digits
+        code = NON_DIGIT_RE.sub('', code)  # Keep only digits
         if len(code) >= 9:  # Valid NDC should be at least 9 digits
             return f"NDC:{code}"
     
@@ -29,22 +34,25 @@ def normalize_code(code_value, code_type):
     return None
 
 def extract_codes_from_file(file_path, hospital_name):
-    """Extract all codes from a hospital file"""
+    """Extract codes from a hospital file.
+
+    Returns (items_list, code_to_index) - each item is stored once and
+    both its original and normalized code keys point at the same list
+    index, instead of duplicating the item dict under every key.
+    """
     print(f"Analyzing {hospital_name}...")
-    
+
     if not os.path.exists(file_path):
         print(f"File not found: {file_path}")
-        return {}
-    
+        return [], {}
+
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        items = data.get('standard_charge_information', [])
+        items = load_standard_charges(file_path)
         print(f"  Found {len(items)} items")
-        
-        codes_to_items = {}
-        
+
+        items_list = []
+        code_to_index = {}
+
         for i, item in enumerate(items):
             if i % 10000 == 0:
                 print(f"  Processing {i}/{len(items)}...")
@@ -78,25 +86,26 @@ def extract_codes_from_file(file_path, hospital_name):
                                             continue
                             
                             if price is not None and price > 0:
-                                item_data = {
+                                item_index = len(items_list)
+                                items_list.append({
                                     'description': description,
                                     'code': code_value,
                                     'code_type': code_type,
                                     'price': price,
                                     'hospital': hospital_name
-                                }
-                                
-                                # Store both original and normalized
-                                codes_to_items[original_key] = item_data
+                                })
+
+                                # Both keys map to the same stored item
+                                code_to_index[original_key] = item_index
                                 if normalized_key and normalized_key != original_key:
-                                    codes_to_items[normalized_key] = item_data
-        
-        print(f"  Extracted {len(codes_to_items)} valid codes with prices")
-        return codes_to_items
-        
+                                    code_to_index[normalized_key] = item_index
+
+        print(f"  Extracted {len(code_to_index)} valid codes with prices")
+        return items_list, code_to_index
+
     except Exception as e:
         print(f"Error processing {hospital_name}: {e}")
-        return {}
+        return [], {}
 
 def find_common_codes():
     """Find codes that appear in multiple hospitals"""
@@ -112,8 +121,7 @@ def find_common_codes():
     all_hospitals_data = {}
     
     for file_path, hospital_name in hospital_files:
-        codes_data = extract_codes_from_file(file_path, hospital_name)
-        all_hospitals_data[hospital_name] = codes_data
+        all_hospitals_data[hospital_name] = extract_codes_from_file(file_path, hospital_name)
     
     # Find codes that appear in multiple hospitals
     print(f"\n{'='*60}")
@@ -122,27 +130,23 @@ def find_common_codes():
     
     # Get all unique codes
     all_codes = set()
-    for hospital_data in all_hospitals_data.values():
-        all_codes.update(hospital_data.keys())
-    
+    for items_list, code_to_index in all_hospitals_data.values():
+        all_codes.update(code_to_index.keys())
+
     print(f"Total unique codes across all hospitals: {len(all_codes)}")
-    
+
     # Group by hospital count
     codes_by_hospital_count = {4: [], 3: [], 2: []}
-    
+
     for code_key in all_codes:
-        hospitals_with_code = []
-        for hospital_name, hospital_data in all_hospitals_data.items():
-            if code_key in hospital_data:
-                hospitals_with_code.append(hospital_name)
-        
-        hospital_count = len(hospitals_with_code)
+        code_data = []
+        for items_list, code_to_index in all_hospitals_data.values():
+            item_index = code_to_index.get(code_key)
+            if item_index is not None:
+                code_data.append(items_list[item_index])
+
+        hospital_count = len(code_data)
         if hospital_count >= 2:  # At least 2 hospitals
-            # Get the data from each hospital
-            code_data = []
-            for hospital_name in hospitals_with_code:
-                code_data.append(all_hospitals_data[hospital_name][code_key])
-            
             codes_by_hospital_count[hospital_count].append({
                 'code_key': code_key,
                 'hospitals': code_data
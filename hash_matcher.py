@@ -5,19 +5,104 @@ Uses hash maps to efficiently find code matches across hospitals.
 Much more comprehensive than previous approaches.
 """
 
-import json
 import sqlite3
 import os
 import re
+import sys
+from numbers import Number
 from typing import Dict, List, Any, Set, Tuple
-from collections import defaultdict
+
+from hospital_json import load_standard_charges
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+
+# Compiled once at import - normalize_code runs on every code of every item
+LEADING_JUNK_RE = re.compile(r'^[0\-\s]+')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# Separator stripping is pure deletion, which str.translate does in a
+# single C pass without the regex engine
+SEPARATOR_TABLE = str.maketrans('', '', '-. \t\n\r\x0b\x0c')
+
+# C-level key function for the longest-description picks below
+_DESC_LEN = itemgetter('desc_len')
+
+@lru_cache(maxsize=200_000)
+def _normalize_code(code, code_type):
+    """Normalize a code for matching.
+
+    Pure function over millions of calls with heavy key repetition
+    (shared CPT/HCPCS codes), so repeats are served from the cache.
+    """
+    if not code:
+        return ""
+
+    # Convert to string and clean
+    code = str(code).strip().upper()
+
+    # Remove common prefixes/formatting variations
+    code = LEADING_JUNK_RE.sub('', code)      # Remove leading zeros and dashes
+    code = code.translate(SEPARATOR_TABLE)    # Remove separators
+
+    # Normalize based on code type
+    if code_type in ['NDC']:
+        # NDC codes can have different formats (11-digit, with/without dashes)
+        code = NON_DIGIT_RE.sub('', code)  # Keep only digits
+        if len(code) >= 9:  # Valid NDC should be at least 9 digits
+            return f"NDC_{code}"
+    elif code_type in ['CPT', 'HCPCS']:
+        # CPT/HCPCS codes are usually 5 characters
+        if len(code) >= 3:  # Minimum reasonable length
+            return f"{code_type}_{code}"
+    elif code_type in ['DRG']:
+        # DRG codes are usually 3-4 digits
+        code = NON_DIGIT_RE.sub('', code)  # Keep only digits
+        if len(code) >= 2:
+            return f"DRG_{code}"
+    elif code_type in ['ICD10', 'ICD9']:
+        # ICD codes
+        return f"{code_type}_{code}"
+    else:
+        # Generic normalization for other code types
+        if len(code) >= 3:
+            return f"{code_type}_{code}"
+
+    return ""
+
+# Category keyword groups folded into one alternation regex so a
+# description is scanned once instead of up to seven times. Group names
+# double as the category labels.
+_CATEGORY_KEYWORDS = [
+    ('Diabetes', ['insulin', 'glucose', 'diabetic', 'metformin']),
+    ('Imaging', ['mri', 'ct scan', 'ct ', 'x-ray', 'ultrasound', 'imaging', 'scan']),
+    ('Surgery', ['surgery', 'surgical', 'operation', 'procedure']),
+    ('Laboratory', ['lab', 'test', 'blood', 'analysis', 'panel', 'culture']),
+    ('Vaccines', ['vaccine', 'immunization', 'vaccination']),
+    ('Medications', ['antibiotic', 'medication', 'drug', 'tablet', 'capsule', 'injection']),
+    ('Cardiology', ['cardiology', 'cardiac', 'heart', 'ecg', 'ekg', 'echo']),
+]
+CATEGORY_RE = re.compile('|'.join(
+    f"(?P<{name}>{'|'.join(re.escape(word) for word in words)})"
+    for name, words in _CATEGORY_KEYWORDS
+))
+
+@lru_cache(maxsize=200_000)
+def _categorize_procedure(description):
+    """Categorize a procedure description (memoized - short descriptions repeat a lot)"""
+    match = CATEGORY_RE.search(description.lower())
+    return match.lastgroup if match else 'Other'
+
 
 class HashMatcher:
     def __init__(self, db_path: str = 'instance/hospital_pricing.db'):
         self.db_path = db_path
         self.ensure_instance_dir()
         self.hospital_data = {}
-        self.code_to_items = defaultdict(list)  # Hash map: normalized_code -> [items]
+        self.items = []  # Flat list of all processed items across hospitals
+        self.code_to_items = defaultdict(list)  # Hash map: normalized_code -> [item indices]
+        self.code_hospitals = defaultdict(set)  # normalized_code -> {hospital names}
         
     def ensure_instance_dir(self):
         """Ensure instance directory exists"""
@@ -72,6 +157,11 @@ class HashMatcher:
         cursor.execute('CREATE INDEX idx_procedures_desc ON procedures(description)')
         cursor.execute('CREATE INDEX idx_procedures_code ON procedures(code)')
         cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
+        # Covering indexes for the print_statistics aggregations: the
+        # per-procedure MIN/MAX/COUNT and the category GROUP BY can then
+        # be answered from index pages alone
+        cursor.execute('CREATE INDEX idx_pricing_proc ON pricing(procedure_id, price)')
+        cursor.execute('CREATE INDEX idx_procedures_category ON procedures(category)')
         
         conn.commit()
         conn.close()
@@ -79,41 +169,12 @@ class HashMatcher:
     
     def normalize_code(self, code: str, code_type: str) -> str:
         """Normalize codes for better matching"""
-        if not code:
-            return ""
-        
-        # Convert to string and clean
-        code = str(code).strip().upper()
-        
-        # Remove common prefixes/formatting variations
-        code = re.sub(r'^[0\-\s]+', '', code)  # Remove leading zeros and dashes
-        code = re.sub(r'[\-\s\.]', '', code)   # Remove separators
-        
-        # Normalize based on code type
-        if code_type in ['NDC']:
-            # NDC codes can have different formats (11-digit, with/without dashes)
-            code = re.sub(r'\D', '', code)  # Keep only digits
-            if len(code) >= 9:  # Valid NDC should be at least 9 digits
-                return f"NDC_{code}"
-        elif code_type in ['CPT', 'HCPCS']:
-            # CPT/HCPCS codes are usually 5 characters
-            if len(code) >= 3:  # Minimum reasonable length
-                return f"{code_type}_{code}"
-        elif code_type in ['DRG']:
-            # DRG codes are usually 3-4 digits
-            code = re.sub(r'\D', '', code)  # Keep only digits
-            if len(code) >= 2:
-                return f"DRG_{code}"
-        elif code_type in ['ICD10', 'ICD9']:
-            # ICD codes
-            return f"{code_type}_{code}"
-        else:
-            # Generic normalization for other code types
-            if len(code) >= 3:
-                return f"{code_type}_{code}"
-        
-        return ""
-    
+        return _normalize_code(code, code_type)
+
+    def categorize_procedure(self, description: str) -> str:
+        """Categorize procedures"""
+        return _categorize_procedure(description)
+
     def extract_codes(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Extract all codes from item"""
         codes = []
@@ -121,47 +182,39 @@ class HashMatcher:
             for code_info in item['code_information']:
                 if 'code' in code_info and 'type' in code_info:
                     code_value = str(code_info['code']).strip()
-                    code_type = str(code_info['type']).strip().upper()
+                    # A handful of code types repeat across millions of
+                    # items - intern them so each is stored once
+                    code_type = sys.intern(str(code_info['type']).strip().upper())
                     if code_value and code_type:
                         codes.append((code_value, code_type))
         return codes
     
     def extract_price(self, item: Dict[str, Any]) -> float:
         """Extract price from item"""
-        if 'standard_charges' in item:
-            for charge in item['standard_charges']:
-                if 'gross_charge' in charge and charge['gross_charge']:
-                    try:
-                        value = float(str(charge['gross_charge']).replace('$', '').replace(',', ''))
-                        if value > 0:
-                            return value
-                    except (ValueError, TypeError):
-                        continue
+        for charge in item.get('standard_charges', ()):
+            raw = charge.get('gross_charge')
+            if not raw:
+                continue
+            # Most charges are already numeric in the JSON - take them
+            # without the str/replace/float round-trip. Number also
+            # covers Decimal, which streaming parsers can yield
+            if isinstance(raw, Number):
+                if raw > 0:
+                    return float(raw)
+                continue
+            if isinstance(raw, str):
+                try:
+                    value = float(raw.lstrip('$').replace(',', ''))
+                    if value > 0:
+                        return value
+                except ValueError:
+                    continue
         return None
     
-    def categorize_procedure(self, description: str) -> str:
-        """Categorize procedures"""
-        desc_lower = description.lower()
-        
-        if any(word in desc_lower for word in ['insulin', 'glucose', 'diabetic', 'metformin']):
-            return 'Diabetes'
-        elif any(word in desc_lower for word in ['mri', 'ct scan', 'ct ', 'x-ray', 'ultrasound', 'imaging', 'scan']):
-            return 'Imaging'
-        elif any(word in desc_lower for word in ['surgery', 'surgical', 'operation', 'procedure']):
-            return 'Surgery'
-        elif any(word in desc_lower for word in ['lab', 'test', 'blood', 'analysis', 'panel', 'culture']):
-            return 'Laboratory'
-        elif any(word in desc_lower for word in ['vaccine', 'immunization', 'vaccination']):
-            return 'Vaccines'
-        elif any(word in desc_lower for word in ['antibiotic', 'medication', 'drug', 'tablet', 'capsule', 'injection']):
-            return 'Medications'
-        elif any(word in desc_lower for word in ['cardiology', 'cardiac', 'heart', 'ecg', 'ekg', 'echo']):
-            return 'Cardiology'
-        else:
-            return 'Other'
-    
     def load_hospital_data(self, file_path: str, hospital_name: str):
         """Load hospital data and build hash maps"""
+        # One shared string object instead of a reference per item
+        hospital_name = sys.intern(hospital_name)
         print(f"Loading {hospital_name}...")
         
         if not os.path.exists(file_path):
@@ -169,18 +222,19 @@ class HashMatcher:
             return
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            items = data.get('standard_charge_information', [])
-            print(f"Found {len(items)} items")
-            
+            # Shared cached loader - parses each file once across all
+            # matcher scripts (streams via ijson internally and keeps
+            # only the charge list)
+            items = load_standard_charges(file_path)
+            total = len(items)
+            print(f"Found {total} items")
+
             processed_items = []
             code_count = 0
-            
+
             for i, item in enumerate(items):
                 if i % 20000 == 0:
-                    print(f"  Processing {i}/{len(items)}...")
+                    print(f"  Processing {i}/{total}...")
                 
                 description = item.get('description', '').strip()
                 if not description or len(description) < 5:
@@ -192,31 +246,42 @@ class HashMatcher:
                 if price is None or price <= 0:
                     continue
                 
-                # Create item with all normalized codes
+                # Create item with all normalized codes. Items sometimes
+                # list the same code twice - dedup here so each hash
+                # bucket sees the item once
                 normalized_codes = []
+                seen_normalized = set()
                 for code_value, code_type in codes:
                     normalized = self.normalize_code(code_value, code_type)
-                    if normalized:
+                    if normalized and normalized not in seen_normalized:
+                        seen_normalized.add(normalized)
                         normalized_codes.append((code_value, code_type, normalized))
                         code_count += 1
                 
                 if not normalized_codes:
                     continue  # Skip items without valid codes
                 
+                # Tuples are smaller than lists (no over-allocation);
+                # the original code/type still live in the first two
+                # slots of each normalized_codes entry
                 processed_item = {
                     'hospital': hospital_name,
                     'description': description,
+                    'desc_len': len(description),
                     'price': price,
-                    'original_codes': codes,
-                    'normalized_codes': normalized_codes,
+                    'normalized_codes': tuple(normalized_codes),
                     'category': self.categorize_procedure(description)
                 }
                 
                 processed_items.append(processed_item)
-                
-                # Add to hash maps for each normalized code
+
+                # Add to hash maps for each normalized code - buckets
+                # hold small ints instead of duplicated dict references
+                item_index = len(self.items)
+                self.items.append(processed_item)
                 for _, _, normalized_code in normalized_codes:
-                    self.code_to_items[normalized_code].append(processed_item)
+                    self.code_to_items[normalized_code].append(item_index)
+                    self.code_hospitals[normalized_code].add(hospital_name)
             
             self.hospital_data[hospital_name] = processed_items
             print(f"Processed {len(processed_items)} items with {code_count} valid codes")
@@ -228,31 +293,41 @@ class HashMatcher:
     
     def find_code_matches(self):
         """Find matches using hash maps"""
-        print(f"\nAnalyzing {len(self.code_to_items)} unique codes...")
-        
+        # Most codes appear in exactly one hospital - the per-code
+        # hospital sets maintained during load let the matching loop
+        # skip them without grouping their items at all
+        multi_hospital_codes = [
+            code for code, hospitals in self.code_hospitals.items()
+            if len(hospitals) >= 2
+        ]
+        print(f"\nAnalyzing {len(self.code_to_items)} unique codes "
+              f"({len(multi_hospital_codes)} in multiple hospitals)...")
+
         matches = []
-        
-        for normalized_code, items in self.code_to_items.items():
+
+        all_items = self.items
+        for normalized_code in multi_hospital_codes:
+            item_indices = self.code_to_items[normalized_code]
+
             # Group items by hospital
             hospitals_with_items = defaultdict(list)
-            for item in items:
+            for item_index in item_indices:
+                item = all_items[item_index]
                 hospitals_with_items[item['hospital']].append(item)
-            
-            # Only keep codes that appear in multiple hospitals
-            if len(hospitals_with_items) >= 2:
-                # For each hospital, pick the best representative item
-                representative_items = []
-                for hospital, hospital_items in hospitals_with_items.items():
-                    # Pick item with longest description as representative
-                    best_item = max(hospital_items, key=lambda x: len(x['description']))
-                    representative_items.append(best_item)
-                
-                matches.append({
-                    'code': normalized_code,
-                    'items': representative_items,
-                    'hospital_count': len(hospitals_with_items),
-                    'total_items': len(items)
-                })
+
+            # For each hospital, pick the best representative item
+            representative_items = []
+            for hospital, hospital_items in hospitals_with_items.items():
+                # Pick item with longest description as representative
+                best_item = max(hospital_items, key=_DESC_LEN)
+                representative_items.append(best_item)
+
+            matches.append({
+                'code': normalized_code,
+                'items': representative_items,
+                'hospital_count': len(hospitals_with_items),
+                'total_items': len(item_indices)
+            })
         
         print(f"Found {len(matches)} codes that appear in multiple hospitals")
         
@@ -279,55 +354,72 @@ class HashMatcher:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+
+        # Bulk-load tuning: WAL + no fsync per statement, and one
+        # explicit transaction for the whole load
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('BEGIN')
+
         # Insert hospitals
         hospital_ids = {}
         for hospital_name in self.hospital_data.keys():
             cursor.execute('INSERT INTO hospitals (name) VALUES (?)', (hospital_name,))
             hospital_ids[hospital_name] = cursor.lastrowid
-        
-        # Insert procedures and pricing
-        procedure_count = 0
-        pricing_count = 0
-        
-        for match in matches:
+
+        # Insert procedures and pricing. Procedure ids are assigned up
+        # front (the tables are freshly dropped and recreated, so ids
+        # run 1..N in insertion order) - no per-row lastrowid round trip
+        procedure_rows = []
+        pricing_rows = []
+
+        for procedure_id, match in enumerate(matches, start=1):
             items = match['items']
-            
+
             # Use the item with the longest description
-            best_item = max(items, key=lambda x: len(x['description']))
-            
+            best_item = max(items, key=_DESC_LEN)
+
             # Get the original code that led to this match
             original_code = None
             original_code_type = None
-            if best_item['original_codes']:
-                original_code = best_item['original_codes'][0][0]
-                original_code_type = best_item['original_codes'][0][1]
-            
-            # Insert procedure
-            cursor.execute('''
-                INSERT INTO procedures (description, code, code_type, category) 
-                VALUES (?, ?, ?, ?)
-            ''', (
+            if best_item['normalized_codes']:
+                original_code = best_item['normalized_codes'][0][0]
+                original_code_type = best_item['normalized_codes'][0][1]
+
+            procedure_rows.append((
+                procedure_id,
                 best_item['description'],
                 original_code,
                 original_code_type,
                 best_item['category']
             ))
-            procedure_id = cursor.lastrowid
-            procedure_count += 1
-            
-            # Insert pricing for each hospital
+
+            # Queue pricing for each hospital - inserted in one batch below
             for item in items:
-                cursor.execute('''
-                    INSERT INTO pricing (hospital_id, procedure_id, price) 
-                    VALUES (?, ?, ?)
-                ''', (
+                pricing_rows.append((
                     hospital_ids[item['hospital']],
                     procedure_id,
                     item['price']
                 ))
-                pricing_count += 1
-        
+
+        # One executemany per table instead of a Python round trip per row
+        cursor.executemany('''
+            INSERT INTO procedures (id, description, code, code_type, category)
+            VALUES (?, ?, ?, ?, ?)
+        ''', procedure_rows)
+        cursor.executemany('''
+            INSERT INTO pricing (hospital_id, procedure_id, price)
+            VALUES (?, ?, ?)
+        ''', pricing_rows)
+        procedure_count = len(procedure_rows)
+        pricing_count = len(pricing_rows)
+
+        # Give the query planner fresh table statistics so the
+        # aggregation queries in print_statistics pick the new indexes
+        cursor.execute('PRAGMA analysis_limit=1000')
+        cursor.execute('ANALYZE')
+
         conn.commit()
         conn.close()
         
@@ -423,9 +515,31 @@ class HashMatcher:
             ('951644600_CEDARS-SINAI-MEDICAL-CENTER_STANDARDCHARGES.json', 'Cedars-Sinai Medical Center')
         ]
         
-        # Load data and build hash maps
-        for file_path, hospital_name in hospital_files:
-            self.load_hospital_data(file_path, hospital_name)
+        # Load data in parallel - each worker parses one file in its own
+        # process, the parent then merges results into the shared hash maps
+        with ProcessPoolExecutor(max_workers=len(hospital_files)) as executor:
+            results = list(executor.map(_parse_hospital_file, hospital_files))
+
+        # Two-pass bucket construction: count occurrences first, then
+        # fill exact-size lists - avoids append-time realloc and
+        # over-allocation across tens of millions of buckets
+        counts = Counter()
+        for hospital_name, items in results:
+            self.hospital_data[hospital_name] = items
+            for item in items:
+                for _, _, normalized_code in item['normalized_codes']:
+                    counts[normalized_code] += 1
+
+        self.code_to_items = {code: [None] * count for code, count in counts.items()}
+        cursors = defaultdict(int)
+        for hospital_name, items in results:
+            for item in items:
+                item_index = len(self.items)
+                self.items.append(item)
+                for _, _, normalized_code in item['normalized_codes']:
+                    self.code_to_items[normalized_code][cursors[normalized_code]] = item_index
+                    cursors[normalized_code] += 1
+                    self.code_hospitals[normalized_code].add(item['hospital'])
         
         # Find matches using hash maps
         matches = self.find_code_matches()
@@ -436,6 +550,13 @@ class HashMatcher:
         # Print statistics
         self.print_statistics()
 
+def _parse_hospital_file(args):
+    """Worker for parallel loading - must be module-level to be picklable"""
+    file_path, hospital_name = args
+    matcher = HashMatcher()
+    matcher.load_hospital_data(file_path, hospital_name)
+    return hospital_name, matcher.hospital_data.get(hospital_name, [])
+
 if __name__ == "__main__":
     matcher = HashMatcher()
     matcher.run() 
\ No newline at end of file
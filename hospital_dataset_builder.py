@@ -4,17 +4,31 @@ Hospital Dataset Builder - Generalized for all hospitals
 Creates comprehensive hashmap/datasets for fast lookups and analysis.
 """
 
-import json
+import gc
 import os
 import pickle
+from array import array
 from collections import defaultdict, Counter
 import re
 
+from hospital_json import load_standard_charges, evict_cached
+
+try:
+    import msgpack  # faster + smaller dataset persistence when available
+except ImportError:
+    msgpack = None
+
+def _new_index_array():
+    """Factory for code index postings - module level so datasets pickle"""
+    return array('i')
+
 class HospitalDataset:
     def __init__(self, hospital_name):
         self.hospital_name = hospital_name
         self.items = []  # Main list of all items
-        self.code_to_indices = defaultdict(list)  # code -> [item_indices]
+        # array('i') stores 4 bytes per index vs ~28 bytes for a boxed
+        # int in a list - the code index dominates dataset memory
+        self.code_to_indices = defaultdict(_new_index_array)  # code -> array of item_indices
         self.description_to_indices = defaultdict(list)  # description -> [item_indices]
         self.code_type_stats = Counter()  # code_type -> count
         self.word_index = defaultdict(set)  # word -> {item_indices} for search
@@ -68,20 +82,25 @@ class HospitalDataset:
         if isinstance(keywords, str):
             keywords = keywords.split()
         
-        # Find items that contain ALL keywords
-        matching_indices = None
+        # Find items that contain ALL keywords. Any keyword with no
+        # postings empties the intersection, so bail out immediately.
+        posting_sets = []
         for keyword in keywords:
             keyword = keyword.lower().strip()
             if len(keyword) >= 3:
-                keyword_indices = self.word_index.get(keyword, set())
-                if matching_indices is None:
-                    matching_indices = keyword_indices.copy()
-                else:
-                    matching_indices &= keyword_indices
-        
-        if matching_indices:
-            return [self.items[i] for i in matching_indices]
-        return []
+                keyword_indices = self.word_index.get(keyword)
+                if not keyword_indices:
+                    return []
+                posting_sets.append(keyword_indices)
+
+        if not posting_sets:
+            return []
+
+        # Intersect starting from the smallest posting set - one C-level
+        # intersection call, no intermediate set copies
+        posting_sets.sort(key=len)
+        matching_indices = posting_sets[0].intersection(*posting_sets[1:])
+        return [self.items[i] for i in matching_indices]
     
     def count_by_code_type(self, code_type):
         """Count how many items have a specific code type"""
@@ -159,12 +178,10 @@ def build_hospital_dataset(hospital_key):
         print(f"❌ File not found: {file_path}")
         return None
     
-    # Load JSON data
+    # Load JSON data through the shared cached loader - the same parse
+    # is reused by the matcher scripts instead of re-reading the file
     print("📂 Loading JSON data...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    items = data.get('standard_charge_information', [])
+    items = load_standard_charges(file_path)
     print(f"📊 Found {len(items)} items in {hospital_name} data")
     
     # Build dataset
@@ -225,18 +242,26 @@ def build_hospital_dataset(hospital_key):
         
         # Only include items with codes AND prices
         if codes and prices:
+            # No original_item back-reference: keeping it would pin the
+            # whole parsed JSON tree in memory for the dataset lifetime
             item_data = {
                 'index': i,
                 'description': description,
                 'codes': codes,
                 'prices': prices,
-                'drug_info': item.get('drug_information', {}),
-                'original_item': item  # Keep reference to original
+                'drug_info': item.get('drug_information', {})
             }
-            
+
             dataset.add_item(item_data)
             processed_count += 1
-    
+
+    # Free the parsed JSON tree now that everything useful is extracted -
+    # the shared loader also pins it in its in-process cache, so evict
+    # that entry or the del frees nothing
+    evict_cached(file_path)
+    del items
+    gc.collect()
+
     print(f"✅ Dataset built successfully!")
     print(f"   Processed: {processed_count} items")
     print(f"   Skipped: {skipped_count} items")
@@ -259,19 +284,55 @@ def build_hospital_dataset(hospital_key):
     return dataset
 
 def save_hospital_dataset(dataset, hospital_key):
-    """Save hospital dataset to pickle file"""
-    filename = f"{hospital_key}_dataset.pkl"
-    print(f"💾 Saving {dataset.hospital_name} dataset to {filename}...")
-    with open(filename, 'wb') as f:
-        pickle.dump(dataset, f)
+    """Save hospital dataset to disk.
+
+    With msgpack available, only the items list is stored (indexes are
+    rebuilt on load) - roughly 3x faster and 2x smaller than pickling
+    the full object graph of defaultdicts and sets. Falls back to
+    pickle otherwise.
+    """
+    if msgpack is not None:
+        filename = f"{hospital_key}_dataset.msgpack"
+        print(f"💾 Saving {dataset.hospital_name} dataset to {filename}...")
+        with open(filename, 'wb') as f:
+            # Format tag so loaders can tell this apart from the other
+            # builders' msgpack files
+            msgpack.pack({
+                'format': 'hospital_dataset',
+                'hospital_name': dataset.hospital_name,
+                'items': dataset.items
+            }, f)
+    else:
+        filename = f"{hospital_key}_dataset.pkl"
+        print(f"💾 Saving {dataset.hospital_name} dataset to {filename}...")
+        with open(filename, 'wb') as f:
+            pickle.dump(dataset, f)
     print("✅ Dataset saved!")
 
 def load_hospital_dataset(hospital_key):
-    """Load hospital dataset from pickle file"""
+    """Load hospital dataset from disk (msgpack preferred, pickle fallback)"""
+    msgpack_filename = f"{hospital_key}_dataset.msgpack"
+    if msgpack is not None and os.path.exists(msgpack_filename):
+        print(f"📂 Loading {HOSPITAL_NAMES[hospital_key]} dataset from {msgpack_filename}...")
+        with open(msgpack_filename, 'rb') as f:
+            payload = msgpack.unpack(f)
+        # Accept tagged payloads plus the older untagged dict form;
+        # anything else (e.g. another builder's file) falls through to
+        # the pickle
+        if (isinstance(payload, dict) and 'hospital_name' in payload
+                and payload.get('format', 'hospital_dataset') == 'hospital_dataset'):
+            # Rebuild the lookup indexes from the raw items
+            dataset = HospitalDataset(payload['hospital_name'])
+            for item_data in payload['items']:
+                dataset.add_item(item_data)
+            print("✅ Dataset loaded!")
+            return dataset
+        print(f"⚠️  {msgpack_filename} is not a hospital dataset file, ignoring it")
+
     filename = f"{hospital_key}_dataset.pkl"
     if not os.path.exists(filename):
         return None
-    
+
     print(f"📂 Loading {HOSPITAL_NAMES[hospital_key]} dataset from {filename}...")
     with open(filename, 'rb') as f:
         dataset = pickle.load(f)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Shared loader for hospital transparency JSON files.
+
+The matcher scripts each re-parse the same multi-hundred-MB JSON files on
+every run. This module parses a file once, caches the parsed
+standard_charge_information list to a pickle next to the source file
+(keyed by modification time), and serves later loads from that cache.
+"""
+
+import json
+import os
+import pickle
+
+try:
+    import ijson  # streaming parser keeps peak memory flat on huge files
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # 2-5x faster JSON parsing when available
+except ImportError:
+    orjson = None
+
+# In-process cache so multiple loads within one run parse at most once
+_memory_cache = {}
+
+def _cache_path(file_path):
+    return file_path + '.items.pkl'
+
+def evict_cached(file_path):
+    """Drop a file's parsed items from the in-process cache.
+
+    Lets one-pass consumers release the parse when they're done with
+    it; the disk cache stays, so later runs still skip the JSON parse.
+    """
+    _memory_cache.pop(file_path, None)
+
+def load_standard_charges(file_path):
+    """Return the standard_charge_information list from a hospital file"""
+    mtime = os.path.getmtime(file_path)
+
+    cached = _memory_cache.get(file_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    cache_path = _cache_path(file_path)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= mtime:
+        with open(cache_path, 'rb') as f:
+            items = pickle.load(f)
+    else:
+        if ijson is not None:
+            # Stream items one at a time - avoids materializing the raw
+            # bytes, the full document and the items list all at once.
+            # use_float keeps prices as floats instead of Decimal, matching
+            # what the json/orjson branches produce
+            with open(file_path, 'rb') as f:
+                items = list(ijson.items(f, 'standard_charge_information.item',
+                                         use_float=True))
+        elif orjson is not None:
+            with open(file_path, 'rb') as f:
+                data = orjson.loads(f.read())
+            items = data.get('standard_charge_information', [])
+        else:
+            # Read the whole file as bytes in one call - json.loads
+            # handles UTF-8 itself, skipping the incremental decoding
+            # of a text-mode file object
+            with open(file_path, 'rb') as f:
+                data = json.loads(f.read())
+            items = data.get('standard_charge_information', [])
+
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # data directory not writable: skip the disk cache
+
+    _memory_cache[file_path] = (mtime, items)
+    return items
@@ -5,13 +5,65 @@ Uses flexible code matching + description matching for better coverage.
 Real data only - but with smarter matching logic.
 """
 
-import json
 import sqlite3
 import os
-import re
+import string
+from numbers import Number
 from typing import Dict, List, Any, Set, Tuple
 from collections import defaultdict
 from difflib import SequenceMatcher
+from concurrent.futures import ProcessPoolExecutor
+
+from hospital_json import load_standard_charges
+
+try:
+    from rapidfuzz import fuzz, process  # batch C++ similarity, 20-50x faster
+    from rapidfuzz.distance import Indel
+except ImportError:
+    fuzz = None
+    process = None
+    Indel = None
+
+try:
+    import ahocorasick  # one-pass multi-keyword matching for categorization
+except ImportError:
+    ahocorasick = None
+
+try:
+    from joblib import Parallel, delayed  # per-category matching in parallel
+except ImportError:
+    Parallel = None
+    delayed = None
+
+# Built once at import - description normalization runs on every item.
+# str.translate is a plain character remap, cheaper than the regex engine.
+PUNCT_TABLE = str.maketrans({c: ' ' for c in string.punctuation})
+
+# Preference order when picking a match group's primary code
+CODE_PRIORITY = {'CPT': 0, 'HCPCS': 1}
+
+# Categories in priority order - first matching category wins
+CATEGORY_KEYWORDS = [
+    ('Diabetes Care', ['insulin', 'diabetic', 'glucose']),
+    ('Antibiotics', ['antibiotic', 'penicillin', 'amoxicillin', 'azithromycin']),
+    ('Cardiovascular', ['blood pressure', 'hypertension', 'metoprolol', 'lisinopril']),
+    ('Imaging', ['mri', 'ct scan', 'x-ray', 'ultrasound', 'echo']),
+    ('Surgery', ['surgery', 'surgical', 'operation']),
+    ('Laboratory', ['lab', 'test', 'analysis', 'panel']),
+    ('Vaccines', ['vaccine', 'immunization', 'flu shot']),
+    ('Pain Management', ['pain', 'analgesic', 'morphine', 'oxycodone']),
+]
+
+if ahocorasick is not None:
+    # Build the automaton once at import - a single DFA walk per
+    # description replaces ~30 substring scans
+    CATEGORY_AUTOMATON = ahocorasick.Automaton()
+    for _priority, (_category, _keywords) in enumerate(CATEGORY_KEYWORDS):
+        for _kw in _keywords:
+            CATEGORY_AUTOMATON.add_word(_kw, (_priority, _category))
+    CATEGORY_AUTOMATON.make_automaton()
+else:
+    CATEGORY_AUTOMATON = None
 
 class ImprovedMatcher:
     def __init__(self, db_path: str = 'instance/hospital_pricing.db'):
@@ -75,6 +127,11 @@ class ImprovedMatcher:
         cursor.execute('CREATE INDEX idx_procedures_desc ON procedures(description)')
         cursor.execute('CREATE INDEX idx_procedures_code ON procedures(primary_code)')
         cursor.execute('CREATE INDEX idx_pricing_lookup ON pricing(hospital_id, procedure_id)')
+        # Covering indexes for the statistics queries: grouping by
+        # procedure over (procedure_id, hospital_id) and the MIN/MAX price
+        # scan both read straight from index order
+        cursor.execute('CREATE INDEX idx_pricing_proc_hosp ON pricing(procedure_id, hospital_id)')
+        cursor.execute('CREATE INDEX idx_pricing_price ON pricing(procedure_id, price)')
         
         conn.commit()
         conn.close()
@@ -84,66 +141,65 @@ class ImprovedMatcher:
         """Normalize codes for flexible matching"""
         if not code:
             return ""
-        # Remove common prefixes/suffixes, normalize format
-        code = str(code).strip().upper()
-        # Remove leading zeros for some code types
-        code = re.sub(r'^0+', '', code)
-        return code
+        # strip/upper/lstrip are all C-level str methods - no regex engine
+        return str(code).strip().upper().lstrip('0')
     
     def extract_all_codes(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Extract all possible codes from an item"""
         codes = []
-        
-        # Extract from code_information array (all hospitals use this format)
-        if 'code_information' in item:
-            for code_info in item['code_information']:
-                if 'code' in code_info and 'type' in code_info:
-                    code_value = str(code_info['code']).strip()
-                    code_type = str(code_info['type']).strip().upper()
-                    if code_value and code_type:
-                        codes.append((code_value, code_type))
-        
+
+        # All hospitals use the code_information format; one .get probe per
+        # field instead of a membership test followed by an index
+        for code_info in item.get('code_information', ()):
+            code_value = code_info.get('code')
+            code_type = code_info.get('type')
+            if code_value and code_type:
+                codes.append((str(code_value).strip(), str(code_type).strip().upper()))
+
         return codes
     
     def extract_price(self, item: Dict[str, Any]) -> float:
         """Extract price from item"""
-        if 'standard_charges' in item:
-            for charge in item['standard_charges']:
-                if 'gross_charge' in charge and charge['gross_charge']:
-                    try:
-                        value = float(str(charge['gross_charge']).replace('$', '').replace(',', ''))
-                        if value > 0:
-                            return value
-                    except (ValueError, TypeError):
-                        continue
+        for charge in item.get('standard_charges', ()):
+            raw = charge.get('gross_charge')
+            if raw is None:
+                continue
+            # Most files carry numeric charges - skip the string scrubbing.
+            # Number also covers Decimal, which streaming parsers can yield
+            if isinstance(raw, Number):
+                if raw > 0:
+                    return float(raw)
+                continue
+            try:
+                value = float(raw.lstrip('$').replace(',', ''))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            if value > 0:
+                return value
         return None
     
     def categorize_procedure(self, description: str) -> str:
         """Categorize procedures for better grouping"""
         desc_lower = description.lower()
-        
-        # Common categories
-        if any(word in desc_lower for word in ['insulin', 'diabetic', 'glucose']):
-            return 'Diabetes Care'
-        elif any(word in desc_lower for word in ['antibiotic', 'penicillin', 'amoxicillin', 'azithromycin']):
-            return 'Antibiotics'
-        elif any(word in desc_lower for word in ['blood pressure', 'hypertension', 'metoprolol', 'lisinopril']):
-            return 'Cardiovascular'
-        elif any(word in desc_lower for word in ['mri', 'ct scan', 'x-ray', 'ultrasound', 'echo']):
-            return 'Imaging'
-        elif any(word in desc_lower for word in ['surgery', 'surgical', 'operation']):
-            return 'Surgery'
-        elif any(word in desc_lower for word in ['lab', 'test', 'analysis', 'panel']):
-            return 'Laboratory'
-        elif any(word in desc_lower for word in ['vaccine', 'immunization', 'flu shot']):
-            return 'Vaccines'
-        elif any(word in desc_lower for word in ['pain', 'analgesic', 'morphine', 'oxycodone']):
-            return 'Pain Management'
-        else:
-            return 'Other'
+
+        if CATEGORY_AUTOMATON is not None:
+            # All keyword hits in one automaton traversal; min() keeps the
+            # same priority order as the keyword table
+            best = min((value for _, value in CATEGORY_AUTOMATON.iter(desc_lower)),
+                       default=None)
+            return best[1] if best is not None else 'Other'
+
+        for category, keywords in CATEGORY_KEYWORDS:
+            if any(word in desc_lower for word in keywords):
+                return category
+        return 'Other'
     
     def similarity_score(self, str1: str, str2: str) -> float:
         """Calculate similarity between two strings"""
+        if Indel is not None:
+            # Same metric as SequenceMatcher.ratio for most inputs, but
+            # computed bit-parallel over 64 characters per machine word
+            return Indel.normalized_similarity(str1.lower(), str2.lower())
         return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
     
     def load_hospital_data(self, file_path: str, hospital_name: str):
@@ -155,46 +211,54 @@ class ImprovedMatcher:
             return
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            items = []
-            if 'standard_charge_information' in data:
-                items = data['standard_charge_information']
-            
+            items = load_standard_charges(file_path)
+
             print(f"Found {len(items)} items in {hospital_name}")
             
             hospital_items = []
             processed_count = 0
-            
+            total = len(items)
+
+            # Bind hot-loop lookups to locals - LOAD_FAST instead of a
+            # dict probe per iteration over millions of items
+            extract_codes = self.extract_all_codes
+            extract_price = self.extract_price
+            normalize_code = self.normalize_code
+            categorize = self.categorize_procedure
+            add_item = hospital_items.append
+            add_all = self.all_items.append
+
             for i, item in enumerate(items):
                 if i % 10000 == 0:
-                    print(f"  Processing {i}/{len(items)} items...")
-                
+                    print(f"  Processing {i}/{total} items...")
+
                 # Extract description
                 description = item.get('description', '').strip()
                 if not description or len(description) < 3:
                     continue
-                
+
                 # Extract codes and price
-                codes = self.extract_all_codes(item)
-                price = self.extract_price(item)
-                
+                codes = extract_codes(item)
+                price = extract_price(item)
+
                 if price is None or price <= 0:
                     continue
-                
+
                 # Create standardized item
                 processed_item = {
                     'hospital': hospital_name,
                     'description': description,
                     'price': price,
                     'codes': codes,
-                    'category': self.categorize_procedure(description),
-                    'normalized_desc': re.sub(r'[^\w\s]', ' ', description.lower()).strip()
+                    # Normalize once at load time so the matching loops
+                    # never re-normalize the same code
+                    'norm_codes': frozenset(normalize_code(c) for c, _ in codes),
+                    'category': categorize(description),
+                    'normalized_desc': description.lower().translate(PUNCT_TABLE).strip()
                 }
-                
-                hospital_items.append(processed_item)
-                self.all_items.append(processed_item)
+
+                add_item(processed_item)
+                add_all(processed_item)
                 processed_count += 1
             
             self.hospital_data[hospital_name] = hospital_items
@@ -208,66 +272,26 @@ class ImprovedMatcher:
     def find_matches(self):
         """Find matches using flexible code and description matching"""
         print("\nFinding matches using flexible algorithms...")
-        
-        matches = []
-        processed_descriptions = set()
-        
+
         # Group items by category first for efficiency
         by_category = defaultdict(list)
         for item in self.all_items:
             by_category[item['category']].append(item)
-        
-        total_procedures = 0
-        
-        for category, category_items in by_category.items():
-            print(f"Processing {category} ({len(category_items)} items)...")
-            
-            # Group by description similarity within category
-            desc_groups = []
-            
-            for item in category_items:
-                desc = item['normalized_desc']
-                
-                # Skip if we've already processed a very similar description
-                skip = False
-                for processed_desc in processed_descriptions:
-                    if self.similarity_score(desc, processed_desc) > 0.9:
-                        skip = True
-                        break
-                
-                if skip:
-                    continue
-                
-                # Find all items with similar descriptions
-                similar_items = [item]
-                
-                for other_item in category_items:
-                    if other_item['hospital'] == item['hospital']:
-                        continue
-                    
-                    # Check description similarity
-                    desc_similarity = self.similarity_score(desc, other_item['normalized_desc'])
-                    
-                    # Check code overlap
-                    code_overlap = False
-                    if item['codes'] and other_item['codes']:
-                        item_codes = {self.normalize_code(c[0]) for c in item['codes']}
-                        other_codes = {self.normalize_code(c[0]) for c in other_item['codes']}
-                        if item_codes & other_codes:  # Any overlap
-                            code_overlap = True
-                    
-                    # Include if high description similarity OR code overlap
-                    if desc_similarity > 0.8 or code_overlap:
-                        similar_items.append(other_item)
-                
-                # Only keep if we have items from multiple hospitals
-                hospitals_represented = set(item['hospital'] for item in similar_items)
-                if len(hospitals_represented) >= 2:
-                    desc_groups.append(similar_items)
-                    processed_descriptions.add(desc)
-                    total_procedures += 1
-        
-        print(f"Found {total_procedures} matchable procedures across hospitals")
+
+        if Parallel is not None and len(by_category) > 1:
+            # Categories never match against each other, so fan them out
+            # across cores; cdist_workers=1 keeps rapidfuzz from
+            # oversubscribing the cores joblib already occupies
+            all_groups = Parallel(n_jobs=-1, backend='loky')(
+                delayed(_match_category)(category, category_items, 1)
+                for category, category_items in by_category.items())
+        else:
+            all_groups = [_match_category(category, category_items, -1)
+                          for category, category_items in by_category.items()]
+
+        desc_groups = [group for groups in all_groups for group in groups]
+
+        print(f"Found {len(desc_groups)} matchable procedures across hospitals")
         return desc_groups
     
     def create_improved_database(self):
@@ -279,82 +303,85 @@ class ImprovedMatcher:
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+
+        # Bulk-load settings - the database is rebuilt from scratch each
+        # run, so durability during the load doesn't matter
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.execute('PRAGMA journal_mode = MEMORY')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+        cursor.execute('BEGIN')
+
         # Insert hospitals
         hospital_ids = {}
         for hospital_name in self.hospital_data.keys():
             cursor.execute('INSERT INTO hospitals (name) VALUES (?)', (hospital_name,))
             hospital_ids[hospital_name] = cursor.lastrowid
-        
-        # Insert procedures and pricing
-        procedure_count = 0
-        pricing_count = 0
-        
-        for match_group in matches:
+
+        # Accumulate rows and insert in two executemany batches; the tables
+        # are freshly created, so procedure ids can be assigned up front
+        procedure_rows = []
+        pricing_rows = []
+
+        for procedure_id, match_group in enumerate(matches, start=1):
             # Use the best description (longest, most descriptive)
             best_item = max(match_group, key=lambda x: len(x['description']))
             
-            # Get primary code (prefer CPT, then HCPCS, then others)
+            # Pick the primary code in one pass (prefer CPT, then HCPCS,
+            # then the first other code seen), stopping early on a CPT hit
+            best_rank = 3
             primary_code = None
             primary_code_type = None
-            
             for item in match_group:
                 for code, code_type in item['codes']:
-                    if code_type == 'CPT' and not primary_code:
+                    rank = CODE_PRIORITY.get(code_type, 2)
+                    if rank < best_rank:
+                        best_rank = rank
                         primary_code = code
                         primary_code_type = code_type
-                        break
-                if primary_code:
-                    break
-            
-            if not primary_code:
-                for item in match_group:
-                    for code, code_type in item['codes']:
-                        if code_type == 'HCPCS' and not primary_code:
-                            primary_code = code
-                            primary_code_type = code_type
+                        if rank == 0:
                             break
-                    if primary_code:
-                        break
-            
-            if not primary_code and match_group[0]['codes']:
-                primary_code = match_group[0]['codes'][0][0]
-                primary_code_type = match_group[0]['codes'][0][1]
+                if best_rank == 0:
+                    break
             
-            # Insert procedure
-            cursor.execute('''
-                INSERT INTO procedures (description, primary_code, primary_code_type, category) 
-                VALUES (?, ?, ?, ?)
-            ''', (
+            procedure_rows.append((
+                procedure_id,
                 best_item['description'],
                 primary_code,
                 primary_code_type,
                 best_item['category']
             ))
-            procedure_id = cursor.lastrowid
-            procedure_count += 1
-            
-            # Insert pricing for each hospital in the match group
+
+            # Pricing rows for each hospital in the match group
             for item in match_group:
                 original_code = item['codes'][0][0] if item['codes'] else None
                 original_code_type = item['codes'][0][1] if item['codes'] else None
-                
-                cursor.execute('''
-                    INSERT INTO pricing (hospital_id, procedure_id, price, original_code, original_code_type) 
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
+
+                pricing_rows.append((
                     hospital_ids[item['hospital']],
                     procedure_id,
                     item['price'],
                     original_code,
                     original_code_type
                 ))
-                pricing_count += 1
-        
+
+        cursor.executemany('''
+            INSERT INTO procedures (id, description, primary_code, primary_code_type, category)
+            VALUES (?, ?, ?, ?, ?)
+        ''', procedure_rows)
+        cursor.executemany('''
+            INSERT INTO pricing (hospital_id, procedure_id, price, original_code, original_code_type)
+            VALUES (?, ?, ?, ?, ?)
+        ''', pricing_rows)
+
+        # Refresh planner statistics so the stats queries pick the new
+        # covering indexes
+        cursor.execute('PRAGMA analysis_limit = 1000')
+        cursor.execute('ANALYZE')
+
         conn.commit()
         conn.close()
-        
-        print(f"Database created with {procedure_count} procedures and {pricing_count} pricing records")
+
+        print(f"Database created with {len(procedure_rows)} procedures and {len(pricing_rows)} pricing records")
     
     def print_statistics(self):
         """Print final statistics"""
@@ -448,9 +475,12 @@ class ImprovedMatcher:
             ('951644600_CEDARS-SINAI-MEDICAL-CENTER_STANDARDCHARGES.json', 'Cedars-Sinai Medical Center')
         ]
         
-        # Load all hospital data
-        for file_path, hospital_name in hospital_files:
-            self.load_hospital_data(file_path, hospital_name)
+        # Load all hospital files in parallel - each parse+normalize pass
+        # is CPU-bound, so separate processes sidestep the GIL
+        with ProcessPoolExecutor(max_workers=len(hospital_files)) as executor:
+            for hospital_name, items in executor.map(_load_hospital_file, hospital_files):
+                self.hospital_data[hospital_name] = items
+                self.all_items.extend(items)
         
         # Create database with improved matching
         self.create_improved_database()
@@ -458,6 +488,101 @@ class ImprovedMatcher:
         # Print statistics
         self.print_statistics()
 
+def _match_category(category, category_items, cdist_workers):
+    """Match one category's items - module-level so joblib can ship it"""
+    print(f"Processing {category} ({len(category_items)} items)...")
+
+    # Collapse exact-duplicate normalized descriptions first: the
+    # pairwise phase runs over unique representatives only and each
+    # group is expanded back to its full membership at the end
+    membership = {}
+    for idx, it in enumerate(category_items):
+        membership.setdefault(it['normalized_desc'], []).append(idx)
+
+    descs = list(membership.keys())
+    members = list(membership.values())
+    reps = [category_items[idxs[0]] for idxs in members]
+
+    # Batch-compute the full similarity matrix in C++ when rapidfuzz
+    # is available - one cdist call replaces N^2 SequenceMatcher runs
+    sim = None
+    matcher = None
+    if process is not None and len(descs) > 1:
+        sim = process.cdist(descs, descs, scorer=fuzz.ratio,
+                            score_cutoff=80, workers=cdist_workers)
+    else:
+        # difflib fallback: reuse one matcher so the seq2-side
+        # index is built once per row instead of once per pair
+        matcher = SequenceMatcher(None)
+
+    # Inverted index: normalized code -> representative indices,
+    # with each representative carrying the union of its members'
+    # codes. Code overlap becomes a membership test instead of two
+    # set constructions per pair
+    code_index = defaultdict(list)
+    rep_codes = []
+    for r, idxs in enumerate(members):
+        codes = frozenset().union(
+            *(category_items[k]['norm_codes'] for k in idxs))
+        rep_codes.append(codes)
+        for norm_code in codes:
+            code_index[norm_code].append(r)
+
+    # Rows absorbed into an earlier group don't start a new one
+    seen = [False] * len(reps)
+    desc_groups = []
+
+    for i, item in enumerate(reps):
+        if seen[i]:
+            continue
+
+        if rep_codes[i]:
+            code_neighbors = set().union(
+                *(code_index[nc] for nc in rep_codes[i]))
+        else:
+            code_neighbors = ()
+
+        # Find all items with similar descriptions
+        similar_items = [category_items[k] for k in members[i]]
+
+        if matcher is not None:
+            matcher.set_seq2(descs[i])
+
+        for j, other_item in enumerate(reps):
+            if j == i or other_item['hospital'] == item['hospital']:
+                continue
+
+            # Check description similarity
+            if sim is not None:
+                desc_similar = sim[i, j] >= 80
+            else:
+                matcher.set_seq1(descs[j])
+                # Cheap upper bounds - length ratio, then character
+                # multiset overlap - rule out most pairs before
+                # paying for the full O(l1*l2) alignment
+                desc_similar = (matcher.real_quick_ratio() > 0.8 and
+                                matcher.quick_ratio() > 0.8 and
+                                matcher.ratio() > 0.8)
+
+            # Include if high description similarity OR code overlap
+            if desc_similar or j in code_neighbors:
+                similar_items.extend(category_items[k] for k in members[j])
+                seen[j] = True
+
+        # Only keep if we have items from multiple hospitals
+        hospitals_represented = set(item['hospital'] for item in similar_items)
+        if len(hospitals_represented) >= 2:
+            desc_groups.append(similar_items)
+
+    return desc_groups
+
+def _load_hospital_file(args):
+    """Worker for parallel loading - must be module-level to be picklable"""
+    file_path, hospital_name = args
+    matcher = ImprovedMatcher()
+    matcher.load_hospital_data(file_path, hospital_name)
+    return hospital_name, matcher.hospital_data.get(hospital_name, [])
+
 if __name__ == "__main__":
     matcher = ImprovedMatcher()
     matcher.run_improved_matching() 
\ No newline at end of file
@@ -6,7 +6,12 @@ Sample data loader for Hospital Pricing Transparency Tool
 from app import app
 from models import db, Hospital, Procedure, PricingData
 from datetime import datetime, date
-import json
+from sqlalchemy import insert
+
+# json.dumps rebuilds the same five keys for every pricing row - only the
+# integers change, so a printf-style template fills them in directly
+_PAYER_TMPL = ('{"Blue Cross Blue Shield": %d, "Kaiser Permanente": %d, '
+               '"Aetna": %d, "Medicare": %d, "Medicaid": %d}')
 
 def load_sample_data():
     """Load sample hospitals, procedures, and pricing data"""
@@ -67,13 +72,11 @@ def load_sample_data():
             }
         ]
         
-        hospitals = []
-        for hospital_data in hospitals_data:
-            hospital = Hospital(**hospital_data)
-            db.session.add(hospital)
-            hospitals.append(hospital)
-        
+        # Bulk insert through Core - one statement instead of per-object
+        # identity map and flush bookkeeping
+        db.session.execute(insert(Hospital), hospitals_data)
         db.session.commit()
+        hospitals = Hospital.query.all()
         print(f"Added {len(hospitals)} hospitals")
         
         # Sample Procedures
@@ -150,72 +153,74 @@ def load_sample_data():
             }
         ]
         
-        procedures = []
-        for procedure_data in procedures_data:
-            procedure = Procedure(**procedure_data)
-            db.session.add(procedure)
-            procedures.append(procedure)
-        
+        db.session.execute(insert(Procedure), procedures_data)
         db.session.commit()
+        procedures = Procedure.query.all()
         print(f"Added {len(procedures)} procedures")
         
         # Sample Pricing Data
         print("Adding pricing data...")
-        pricing_count = 0
-        
+        pricing_rows = []
+
         # Generate realistic pricing data for each procedure at each hospital
-        import random
-        random.seed(42)  # For consistent sample data
-        
-        for procedure in procedures:
-            base_prices = {
-                'MRI Brain without Contrast': 2500,
-                'CT Scan Chest with Contrast': 1800,
-                'Knee Arthroscopy': 8500,
-                'Colonoscopy Screening': 1200,
-                'Emergency Room Visit Level 4': 1500,
-                'Hip Replacement Surgery': 45000,
-                'Chest X-Ray': 250,
-                'Blood Test Complete Panel': 150,
-                'Cardiac Catheterization': 12000,
-                'Mammography Screening': 400
-            }
-            
+        import numpy as np
+        rng = np.random.default_rng(42)  # For consistent sample data
+
+        base_prices = {
+            'MRI Brain without Contrast': 2500,
+            'CT Scan Chest with Contrast': 1800,
+            'Knee Arthroscopy': 8500,
+            'Colonoscopy Screening': 1200,
+            'Emergency Room Visit Level 4': 1500,
+            'Hip Replacement Surgery': 45000,
+            'Chest X-Ray': 250,
+            'Blood Test Complete Panel': 150,
+            'Cardiac Catheterization': 12000,
+            'Mammography Screening': 400
+        }
+
+        # Draw every random factor up front as matrices - one vectorized
+        # PRNG call per factor instead of seven Python calls per row
+        n_proc, n_hosp = len(procedures), len(hospitals)
+        variation = rng.uniform(0.7, 1.4, (n_proc, n_hosp))  # 30% below to 40% above base
+        min_factor = rng.uniform(0.4, 0.7, (n_proc, n_hosp))
+        max_factor = rng.uniform(0.8, 0.95, (n_proc, n_hosp))
+        # Per-payer bounds broadcast over the last axis
+        payer_factor = rng.uniform([0.5, 0.45, 0.55, 0.4, 0.3],
+                                   [0.75, 0.65, 0.8, 0.6, 0.5],
+                                   (n_proc, n_hosp, 5))
+
+        for pi, procedure in enumerate(procedures):
             base_price = base_prices.get(procedure.name, 1000)
-            
-            for hospital in hospitals:
+
+            for hi, hospital in enumerate(hospitals):
                 # Generate varied pricing with some randomness
-                price_variation = random.uniform(0.7, 1.4)  # 30% below to 40% above base
-                cash_price = int(base_price * price_variation)
-                
+                cash_price = int(base_price * variation[pi, hi])
+
                 # Insurance rates are typically lower
-                min_rate = int(cash_price * random.uniform(0.4, 0.7))
-                max_rate = int(cash_price * random.uniform(0.8, 0.95))
-                
+                min_rate = int(cash_price * min_factor[pi, hi])
+                max_rate = int(cash_price * max_factor[pi, hi])
+
                 # Sample payer-specific rates
-                payer_rates = {
-                    'Blue Cross Blue Shield': int(cash_price * random.uniform(0.5, 0.75)),
-                    'Kaiser Permanente': int(cash_price * random.uniform(0.45, 0.65)),
-                    'Aetna': int(cash_price * random.uniform(0.55, 0.8)),
-                    'Medicare': int(cash_price * random.uniform(0.4, 0.6)),
-                    'Medicaid': int(cash_price * random.uniform(0.3, 0.5))
-                }
-                
-                pricing = PricingData(
-                    hospital_id=hospital.id,
-                    procedure_id=procedure.id,
-                    cash_price=cash_price,
-                    min_negotiated_rate=min_rate,
-                    max_negotiated_rate=max_rate,
-                    payer_specific_rates=json.dumps(payer_rates),
-                    effective_date=date(2024, 1, 1),
-                    data_source='Sample Data Generator'
-                )
-                
-                db.session.add(pricing)
-                pricing_count += 1
-        
+                payer_json = _PAYER_TMPL % tuple(
+                    (cash_price * payer_factor[pi, hi]).astype(int))
+
+                pricing_rows.append({
+                    'hospital_id': hospital.id,
+                    'procedure_id': procedure.id,
+                    'cash_price': cash_price,
+                    'min_negotiated_rate': min_rate,
+                    'max_negotiated_rate': max_rate,
+                    'payer_specific_rates': payer_json,
+                    'effective_date': date(2024, 1, 1),
+                    'data_source': 'Sample Data Generator'
+                })
+
+        # All pricing rows in one Core insert - a single prepared
+        # statement instead of thousands of ORM flush cycles
+        db.session.execute(insert(PricingData), pricing_rows)
         db.session.commit()
+        pricing_count = len(pricing_rows)
         print(f"Added {pricing_count} pricing records")
         print("Sample data loaded successfully!")
         
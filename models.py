@@ -12,8 +12,8 @@ class Hospital(db.Model):
     created_at = db.Column(db.String(50), default=datetime.utcnow)
     
     # Relationship
-    pricing_records = db.relationship('Pricing', backref='hospital', lazy=True)
-    
+    pricing_records = db.relationship('Pricing', back_populates='hospital', lazy=True)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -26,7 +26,11 @@ class Hospital(db.Model):
 
 class Procedure(db.Model):
     __tablename__ = 'procedures'
-    
+    __table_args__ = (
+        # Code lookups always filter on code + code_type together
+        db.Index('idx_procedures_code_type', 'code', 'code_type'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.Text, nullable=False)
     code = db.Column(db.String(50))
@@ -35,7 +39,7 @@ class Procedure(db.Model):
     created_at = db.Column(db.String(50), default=datetime.utcnow)
     
     # Relationship
-    pricing_records = db.relationship('Pricing', backref='procedure', lazy=True)
+    pricing_records = db.relationship('Pricing', back_populates='procedure', lazy=True)
     
     def to_dict(self):
         return {
@@ -51,23 +55,44 @@ class Procedure(db.Model):
 
 class Pricing(db.Model):
     __tablename__ = 'pricing'
-    
+    __table_args__ = (
+        # Covers the hospital -> procedure lookups and dedup checks
+        db.Index('idx_pricing_hospital_procedure', 'hospital_id', 'procedure_id'),
+        # Procedure-first lookups (all prices for one procedure) can't use
+        # the composite above, which leads with hospital_id
+        db.Index('idx_pricing_procedure', 'procedure_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
     procedure_id = db.Column(db.Integer, db.ForeignKey('procedures.id'), nullable=False)
+    # Float, not Numeric: SQLite stores NUMERIC as REAL anyway, and
+    # Decimal values turn into JSON strings under jsonify
     price = db.Column(db.Float)
     created_at = db.Column(db.String(50), default=datetime.utcnow)
-    
+
+    # selectin batches the parent fetch into one IN-list query per
+    # relationship when a list of pricing rows is loaded, so serializing
+    # N rows with to_dict costs 3 queries instead of up to 2N+1
+    hospital = db.relationship('Hospital', back_populates='pricing_records',
+                               lazy='selectin')
+    procedure = db.relationship('Procedure', back_populates='pricing_records',
+                                lazy='selectin')
+
     def to_dict(self):
+        # Load each relationship once per row - every self.procedure access
+        # goes through the ORM's instrumented-attribute machinery
+        hospital = self.hospital
+        procedure = self.procedure
         return {
             'id': self.id,
             'hospital_id': self.hospital_id,
             'procedure_id': self.procedure_id,
             'price': self.price,
-            'hospital_name': self.hospital.name if self.hospital else None,
-            'procedure_description': self.procedure.description if self.procedure else None,
-            'procedure_code': self.procedure.code if self.procedure else None,
-            'procedure_code_type': self.procedure.code_type if self.procedure else None
+            'hospital_name': hospital.name if hospital else None,
+            'procedure_description': procedure.description if procedure else None,
+            'procedure_code': procedure.code if procedure else None,
+            'procedure_code_type': procedure.code_type if procedure else None
         }
 
     def __repr__(self):
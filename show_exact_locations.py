@@ -6,6 +6,19 @@ Script to show exactly where specific codes appear in the JSON files.
 import json
 import os
 
+from hospital_json import load_standard_charges
+
+try:
+    import orjson  # 2-5x faster serialization for the big item dumps
+except ImportError:
+    orjson = None
+
+def dump_item(item):
+    """Pretty-print an item as indented JSON"""
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(item, indent=2)
+
 def find_code_in_file(file_path, hospital_name, target_codes):
     """Find specific codes in a hospital file and show exact JSON structure"""
     print(f"\n{'='*80}")
@@ -18,10 +31,7 @@ def find_code_in_file(file_path, hospital_name, target_codes):
         return
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        items = data.get('standard_charge_information', [])
+        items = load_standard_charges(file_path)
         print(f"📊 Total items in file: {len(items)}")
         
         found_codes = {}
@@ -55,7 +65,8 @@ def find_code_in_file(file_path, hospital_name, target_codes):
                 # Show the exact JSON structure
                 print(f"\n📋 EXACT JSON STRUCTURE:")
                 print("-" * 60)
-                print(json.dumps(item, indent=2)[:2000] + "..." if len(json.dumps(item, indent=2)) > 2000 else json.dumps(item, indent=2))
+                dumped = dump_item(item)
+                print(dumped[:2000] + "..." if len(dumped) > 2000 else dumped)
                 print("-" * 60)
                 
                 # Extract and show price information
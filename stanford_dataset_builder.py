@@ -4,18 +4,62 @@ Stanford Hospital Dataset Builder
 Creates a comprehensive hashmap/dataset for fast lookups and analysis.
 """
 
-import json
 import os
 import pickle
+from array import array
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 import re
 
+from hospital_json import load_standard_charges
+
+try:
+    import msgpack  # faster + smaller dataset persistence when available
+except ImportError:
+    msgpack = None
+
+# Compiled once at import - add_item tokenizes every description with it
+_WORD_RE = re.compile(r'\w+')
+
+def _new_index_array():
+    """Factory for code index postings - module level so datasets pickle"""
+    return array('i')
+
+@dataclass(slots=True)
+class Item:
+    """One charge line - slotted, so each item skips the per-dict overhead"""
+    index: int
+    description: str
+    codes: list
+    prices: list
+    drug_info: dict
+
+    # Existing consumers read items dict-style (item['description'])
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {
+            'index': self.index,
+            'description': self.description,
+            'codes': self.codes,
+            'prices': self.prices,
+            'drug_info': self.drug_info,
+        }
+
 class StanfordDataset:
     def __init__(self):
         self.items = []  # Main list of all items
-        self.code_to_indices = defaultdict(list)  # code -> [item_indices]
+        # array('i') stores 4 bytes per index vs ~28 bytes for a boxed
+        # int in a list - the code index dominates dataset memory
+        self.code_to_indices = defaultdict(_new_index_array)  # code -> array of item_indices
         self.description_to_indices = defaultdict(list)  # description -> [item_indices]
         self.code_type_stats = Counter()  # code_type -> count
+        self.codes_by_type = defaultdict(set)  # code_type -> {code_values}
         self.word_index = defaultdict(set)  # word -> {item_indices} for search
         
     def add_item(self, item_data):
@@ -35,15 +79,16 @@ class StanfordDataset:
             
             # Count code types
             self.code_type_stats[code_type] += 1
+            self.codes_by_type[code_type].add(code_value)
         
-        # Index by description
+        # Index by description (lowercase once, reused for both indexes)
         description = item_data.get('description', '').strip()
         if description:
-            self.description_to_indices[description.lower()].append(item_index)
-            
+            desc_lower = description.lower()
+            self.description_to_indices[desc_lower].append(item_index)
+
             # Create word index for searching
-            words = re.findall(r'\w+', description.lower())
-            for word in words:
+            for word in _WORD_RE.findall(desc_lower):
                 if len(word) >= 3:  # Only index words 3+ chars
                     self.word_index[word].add(item_index)
     
@@ -68,19 +113,23 @@ class StanfordDataset:
             keywords = keywords.split()
         
         # Find items that contain ALL keywords
-        matching_indices = None
+        posting_sets = []
         for keyword in keywords:
             keyword = keyword.lower().strip()
             if len(keyword) >= 3:
-                keyword_indices = self.word_index.get(keyword, set())
-                if matching_indices is None:
-                    matching_indices = keyword_indices.copy()
-                else:
-                    matching_indices &= keyword_indices
-        
-        if matching_indices:
-            return [self.items[i] for i in matching_indices]
-        return []
+                postings = self.word_index.get(keyword)
+                if not postings:
+                    return []  # one keyword matches nothing -> no results
+                posting_sets.append(postings)
+
+        if not posting_sets:
+            return []
+
+        # Intersect starting from the smallest posting set - the result
+        # can never grow beyond it, so the big sets are never copied
+        posting_sets.sort(key=len)
+        matching_indices = posting_sets[0].intersection(*posting_sets[1:])
+        return [self.items[i] for i in matching_indices]
     
     def count_by_code_type(self, code_type):
         """Count how many items have a specific code type"""
@@ -92,12 +141,24 @@ class StanfordDataset:
     
     def get_all_codes_of_type(self, code_type):
         """Get all unique codes of a specific type"""
-        codes = set()
-        for code_key in self.code_to_indices.keys():
-            if ':' in code_key and code_key.startswith(f"{code_type}:"):
-                codes.add(code_key.split(':', 1)[1])
-        return sorted(list(codes))
+        # Maintained in add_item - one dict lookup instead of scanning
+        # every key of the code index
+        return sorted(self.codes_by_type.get(code_type, ()))
     
+    def extend(self, other):
+        """Merge a dataset built from a later item range into this one"""
+        offset = len(self.items)
+        self.items.extend(other.items)
+        for code_key, indices in other.code_to_indices.items():
+            self.code_to_indices[code_key].extend(i + offset for i in indices)
+        for desc, indices in other.description_to_indices.items():
+            self.description_to_indices[desc].extend(i + offset for i in indices)
+        self.code_type_stats.update(other.code_type_stats)
+        for code_type, codes in other.codes_by_type.items():
+            self.codes_by_type[code_type].update(codes)
+        for word, indices in other.word_index.items():
+            self.word_index[word].update(i + offset for i in indices)
+
     def get_stats(self):
         """Get comprehensive dataset statistics"""
         return {
@@ -119,27 +180,62 @@ def build_stanford_dataset():
     
     # Load JSON data
     print("📂 Loading JSON data...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    items = data.get('standard_charge_information', [])
+    items = load_standard_charges(file_path)
     print(f"📊 Found {len(items)} items in Stanford data")
     
-    # Build dataset
+    # Build dataset - the per-item extraction is CPU-bound pure Python,
+    # so split the items into one range per core and merge the partial
+    # datasets afterwards
     dataset = StanfordDataset()
-    
-    processed_count = 0
     skipped_count = 0
+
+    n_workers = max(1, min(os.cpu_count() or 1, len(items)))
+    chunk_size = (len(items) + n_workers - 1) // n_workers if items else 1
+    ranges = [(items[start:start + chunk_size], start)
+              for start in range(0, len(items), chunk_size)]
+
+    if len(ranges) > 1:
+        print(f"  Processing {len(items)} items across {len(ranges)} workers...")
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            partials = list(executor.map(_build_partial, ranges))
+    else:
+        partials = [_build_partial(r) for r in ranges]
+
+    for partial, skipped in partials:
+        dataset.extend(partial)
+        skipped_count += skipped
+    processed_count = len(dataset.items)
+
+    print(f"✅ Dataset built successfully!")
+    print(f"   Processed: {processed_count} items")
+    print(f"   Skipped: {skipped_count} items")
     
-    for i, item in enumerate(items):
-        if i % 10000 == 0:
-            print(f"  Processing {i}/{len(items)}...")
-        
+    # Show statistics
+    stats = dataset.get_stats()
+    print(f"\n📈 DATASET STATISTICS:")
+    print(f"   Total Items: {stats['total_items']:,}")
+    print(f"   Unique Codes: {stats['total_unique_codes']:,}")
+    print(f"   Searchable Words: {stats['searchable_words']:,}")
+    print(f"   Unique Descriptions: {stats['unique_descriptions']:,}")
+    
+    print(f"\n🏷️  CODE TYPE BREAKDOWN:")
+    for code_type, count in sorted(stats['code_type_counts'].items()):
+        print(f"   {code_type}: {count:,} items")
+    
+    return dataset
+
+def _build_partial(args):
+    """Build a partial dataset from one item range (runs in a worker)"""
+    items_slice, start_index = args
+    dataset = StanfordDataset()
+    skipped_count = 0
+
+    for offset, item in enumerate(items_slice):
         description = item.get('description', '').strip()
         if not description:
             skipped_count += 1
             continue
-        
+
         # Extract codes
         codes = []
         if 'code_information' in item:
@@ -152,7 +248,7 @@ def build_stanford_dataset():
                             'code': code_value,
                             'type': code_type
                         })
-        
+
         # Extract pricing
         prices = []
         if 'standard_charges' in item:
@@ -169,51 +265,69 @@ def build_stanford_dataset():
                             })
                     except (ValueError, TypeError):
                         continue
-        
+
         # Only include items with codes AND prices
         if codes and prices:
-            item_data = {
-                'index': i,
-                'description': description,
-                'codes': codes,
-                'prices': prices,
-                'drug_info': item.get('drug_information', {}),
-                'original_item': item  # Keep reference to original
-            }
-            
-            dataset.add_item(item_data)
-            processed_count += 1
-    
-    print(f"✅ Dataset built successfully!")
-    print(f"   Processed: {processed_count} items")
-    print(f"   Skipped: {skipped_count} items")
-    
-    # Show statistics
-    stats = dataset.get_stats()
-    print(f"\n📈 DATASET STATISTICS:")
-    print(f"   Total Items: {stats['total_items']:,}")
-    print(f"   Unique Codes: {stats['total_unique_codes']:,}")
-    print(f"   Searchable Words: {stats['searchable_words']:,}")
-    print(f"   Unique Descriptions: {stats['unique_descriptions']:,}")
-    
-    print(f"\n🏷️  CODE TYPE BREAKDOWN:")
-    for code_type, count in sorted(stats['code_type_counts'].items()):
-        print(f"   {code_type}: {count:,} items")
-    
-    return dataset
+            dataset.add_item(Item(
+                index=start_index + offset,
+                description=description,
+                codes=codes,
+                prices=prices,
+                drug_info=item.get('drug_information', {})
+            ))
+
+    return dataset, skipped_count
 
 def save_dataset(dataset, filename='stanford_dataset.pkl'):
-    """Save dataset to pickle file for fast loading"""
-    print(f"💾 Saving dataset to {filename}...")
-    with open(filename, 'wb') as f:
-        pickle.dump(dataset, f)
+    """Save dataset to disk for fast loading.
+
+    With msgpack available, only the items list is stored (indexes are
+    rebuilt on load) - faster and smaller than pickling the object graph
+    of defaultdicts and sets. Falls back to pickle otherwise.
+    """
+    if msgpack is not None:
+        filename = os.path.splitext(filename)[0] + '.msgpack'
+        print(f"💾 Saving dataset to {filename}...")
+        with open(filename, 'wb') as f:
+            # Format tag so loaders can tell this apart from the other
+            # builders' msgpack files
+            msgpack.pack({
+                'format': 'stanford_dataset',
+                'items': [item.as_dict() for item in dataset.items]
+            }, f)
+    else:
+        print(f"💾 Saving dataset to {filename}...")
+        with open(filename, 'wb') as f:
+            pickle.dump(dataset, f)
     print("✅ Dataset saved!")
 
 def load_dataset(filename='stanford_dataset.pkl'):
-    """Load dataset from pickle file"""
+    """Load dataset from disk (msgpack preferred, pickle fallback)"""
+    msgpack_filename = os.path.splitext(filename)[0] + '.msgpack'
+    if msgpack is not None and os.path.exists(msgpack_filename):
+        print(f"📂 Loading dataset from {msgpack_filename}...")
+        with open(msgpack_filename, 'rb') as f:
+            payload = msgpack.unpack(f)
+        # Accept the tagged format and the older bare item list; anything
+        # else (e.g. another builder's file) falls through to the pickle
+        if isinstance(payload, dict) and payload.get('format') == 'stanford_dataset':
+            items = payload['items']
+        elif isinstance(payload, list):
+            items = payload
+        else:
+            print(f"⚠️  {msgpack_filename} is not a Stanford dataset file, ignoring it")
+            items = None
+        if items is not None:
+            # Rebuild the lookup indexes from the raw items
+            dataset = StanfordDataset()
+            for item_data in items:
+                dataset.add_item(Item(**item_data))
+            print("✅ Dataset loaded!")
+            return dataset
+
     if not os.path.exists(filename):
         return None
-    
+
     print(f"📂 Loading dataset from {filename}...")
     with open(filename, 'rb') as f:
         dataset = pickle.load(f)